@@ -7,7 +7,7 @@ from langchain.llms import OpenAIChat
 from pydantic import Extra
 
 from langsearch.pipelines.common.index import SimpleIndexPipeline
-from langsearch.utils import openai_length_function
+from langsearch.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +21,7 @@ class QAChain(Chain):
                  qa_chain=load_qa_chain(llm=OpenAIChat(temperature=0)),
                  qa_chain_question_input_name="question",
                  document_search_question_input_name="question",
-                 length_function=openai_length_function,
+                 length_function=count_tokens,
                  max_context_size=4096,
                  method_or_docs=SimpleIndexPipeline().get_similar_sections,
                  method_args=None,
@@ -1,3 +1,6 @@
+from scrapy.exceptions import DropItem
+
+
 class SettingsError(Exception):
     """
     This exception should be raised when a required langsearch setting is missing or incorrectly specified in the
@@ -11,3 +14,16 @@ class IgnoreResponse(Exception):
     This exception should be raised by spider middlewares when they want to ignore a response.
     """
     pass
+
+
+class BudgetExceeded(DropItem):
+    """
+    This exception is raised when a pipeline takes longer than its TIME_BUDGET for an item.
+    """
+    def __init__(self, pipeline, message):
+        super().__init__(pipeline, message)
+        self.pipeline = pipeline
+        self.message = message
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,162 @@
+from collections import Counter
+import json
+import math
+import os
+import threading
+
+import langdetect
+from langdetect.detector_factory import init_factory
+from langdetect import detector_factory
+from langdetect.lang_detect_exception import LangDetectException
+from langdetect.utils.ngram import NGram
+
+
+class LanguageDetector:
+    """
+    Base class of the language detectors. Long texts are not detected as a whole, but from `sample_windows` windows of
+    `window_size` characters spread evenly over the text, so that the cost of detection doesn't grow with the length
+    of the text.
+    """
+    def __init__(self, sample_windows=3, window_size=1000):
+        self.sample_windows = sample_windows
+        self.window_size = window_size
+
+    def sample(self, text):
+        if self.sample_windows <= 0 or len(text) <= self.sample_windows * self.window_size:
+            return text
+        step = (len(text) - self.window_size) / max(self.sample_windows - 1, 1)
+        starts = [round(i * step) for i in range(self.sample_windows)]
+        return "\n".join(text[start:start + self.window_size] for start in starts)
+
+    def get_probabilities(self, text):
+        """
+        Returns a list of (language, probability) tuples for the sampled `text`, most likely language first. The list
+        is empty if the text has nothing to detect the language from.
+        """
+        raise NotImplementedError
+
+    def detect(self, text):
+        """
+        Returns the most likely language of `text`, or None if the text has nothing to detect the language from.
+        """
+        probabilities = self.get_probabilities(text)
+        if len(probabilities) == 0:
+            return None
+        return probabilities[0][0]
+
+
+class LangdetectDetector(LanguageDetector):
+    """
+    Detects languages with langdetect, seeded with `seed` so that the same text always gets the same result.
+    """
+    def __init__(self, seed=0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seed = seed
+
+    def get_probabilities(self, text):
+        init_factory()
+        detector = detector_factory._factory.create()
+        detector.seed = self.seed
+        detector.append(self.sample(text))
+        try:
+            languages = detector.get_probabilities()
+        except LangDetectException:
+            return []
+        return [(language.lang, language.prob) for language in languages]
+
+
+PROFILES_DIR = os.path.join(os.path.dirname(langdetect.__file__), "profiles")
+# Probability of an n-gram that is missing from a language profile, relative to one occurrence
+MISSING_NGRAM_COUNT = 0.5
+# The scores are scaled down to this many n-grams, so that long texts don't give certainty by sheer length
+MAX_EVIDENCE = 100
+
+
+class NormalizationTable(dict):
+    """
+    Translation table for str.translate that normalizes characters like langdetect, computing each one only once.
+    """
+    def __missing__(self, code):
+        normalized = NGram.normalize(chr(code))
+        self[code] = normalized
+        return normalized
+
+
+_normalization_table = NormalizationTable()
+
+
+class NgramProfileDetector(LanguageDetector):
+    """
+    Detects languages with a naive Bayes classifier over the 1 to 3-grams of langdetect's language profiles, which are
+    installed with langdetect. Unlike langdetect, it scores all n-grams of the text once instead of running random
+    trials, which is faster and deterministic. The probabilities are not calibrated like langdetect's.
+    """
+    _profiles = None
+    _profiles_lock = threading.Lock()
+
+    @classmethod
+    def load_profiles(cls):
+        """
+        Returns the languages, the log probability of a missing n-gram per language and n, and an index mapping each
+        n-gram to (language index, log probability minus the missing log probability) tuples.
+        """
+        with cls._profiles_lock:
+            if cls._profiles is None:
+                languages = []
+                missing = []
+                index = {}
+                for filename in sorted(os.listdir(PROFILES_DIR)):
+                    with open(os.path.join(PROFILES_DIR, filename), encoding="utf-8") as f:
+                        profile = json.load(f)
+                    i = len(languages)
+                    languages.append(profile["name"])
+                    missing.append([math.log(MISSING_NGRAM_COUNT / n_words) for n_words in profile["n_words"]])
+                    for ngram, count in profile["freq"].items():
+                        n = len(ngram)
+                        if not 1 <= n <= 3:
+                            continue
+                        delta = math.log(count / profile["n_words"][n - 1]) - missing[i][n - 1]
+                        index.setdefault(ngram, []).append((i, delta))
+                cls._profiles = languages, missing, index
+            return cls._profiles
+
+    @staticmethod
+    def get_ngrams(text):
+        """
+        Returns a Counter of the 1 to 3-grams of the words in `text`, normalized like langdetect does.
+        """
+        normalized = text.translate(_normalization_table)
+        ngrams = Counter()
+        for word in normalized.split():
+            if len(word) > 1 and sum(1 for char in word if char.isupper()) > 1:
+                # langdetect skips words with several capitals, e.g. acronyms
+                continue
+            ngrams.update(word)
+            padded = f" {word} "
+            ngrams.update(padded[i:i + 2] for i in range(len(padded) - 1))
+            ngrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return ngrams
+
+    def get_probabilities(self, text):
+        languages, missing, index = self.load_profiles()
+        counts = [0, 0, 0]
+        scores = [0.0] * len(languages)
+        for ngram, count in self.get_ngrams(self.sample(text)).items():
+            entries = index.get(ngram)
+            if entries is None:
+                continue
+            counts[len(ngram) - 1] += count
+            for i, delta in entries:
+                scores[i] += count * delta
+        total = sum(counts)
+        if total == 0:
+            return []
+        scale = min(1.0, MAX_EVIDENCE / total)
+        for i in range(len(languages)):
+            scores[i] = scale * (scores[i] + sum(count * log_p for count, log_p in zip(counts, missing[i])))
+        best = max(scores)
+        weights = [math.exp(score - best) for score in scores]
+        norm = sum(weights)
+        probabilities = [(language, weight / norm) for language, weight in zip(languages, weights)]
+        probabilities.sort(key=lambda x: x[1], reverse=True)
+        return [(language, probability) for language, probability in probabilities if probability > 0.01]
@@ -0,0 +1,28 @@
+import argparse
+
+from langsearch.pipelines.common.mixins.weaviatedb import WeaviateDB, WeaviateMixin
+
+# The classes of SummaryIndexPipeline and ImageIndexPipeline, whose data objects older versions stored under random
+# uuids
+DEFAULT_CLASS_NAMES = ["Summary", "Image"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Moves data objects that older versions of langsearch stored under random uuids to the uuids "
+                    "derived from their URL. Run it once after upgrading, before the next crawl."
+    )
+    parser.add_argument("class_names", nargs="*", default=DEFAULT_CLASS_NAMES)
+    parser.add_argument("--weaviate-base-url", default=WeaviateMixin.WEAVIATE_BASE_URL)
+    args = parser.parse_args()
+    db = WeaviateDB(args.weaviate_base_url)
+    for class_name in args.class_names:
+        if not db.class_exists(class_name):
+            print(f"Class {class_name} does not exist, skipping it")
+            continue
+        moved = db.migrate_to_uuids(class_name)
+        print(f"Moved {moved} data objects of class {class_name} to deterministic uuids")
+
+
+if __name__ == "__main__":
+    main()
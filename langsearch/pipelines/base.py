@@ -1,15 +1,65 @@
+import copy
+import functools
 import importlib
+import inspect
 import json
 import logging
 from pathlib import Path
 import re
+from types import SimpleNamespace
 
-from langsearch.exceptions import SettingsError
+from langsearch.exceptions import BudgetExceeded, SettingsError
 
 
 logger = logging.getLogger(__name__)
 
 
+class ItemContext(SimpleNamespace):
+    """
+    Holds the inputs of one item for one pipeline as attributes, e.g. `context.html` and `context.url`. An input is None
+    if the item doesn't have it.
+    """
+    pass
+
+
+def get_response_attribute(name, item):
+    return getattr(item["response"], name)
+
+
+def response_attribute(name):
+    """
+    Returns a callable for INPUTS that gives the attribute `name` of the Scrapy response of the item, e.g. its url.
+    Unlike a lambda, it can be pickled, which the worker processes of `assemble(..., process_pool=True)` need.
+    """
+    return functools.partial(get_response_attribute, name)
+
+
+def adapt_apply(apply):
+    """
+    Returns a wrapper of the `apply` method of a pipeline class that takes both conventions, `apply(item, spider)` with
+    the inputs in instance variables and `apply(item, spider, context)`, whichever convention `apply` itself uses. So
+    a subclass can call `super().apply()` in its own convention.
+    """
+    if len(inspect.signature(apply).parameters) < 4:
+        @functools.wraps(apply)
+        def adapted(self, item, spider, context=None):
+            if context is None:
+                return apply(self, item, spider)
+            # The older apply reads its inputs from instance variables, so each item gets its own shallow copy of the
+            # pipeline
+            pipeline = copy.copy(self)
+            pipeline.__dict__.update(vars(context))
+            return apply(pipeline, item, spider)
+    else:
+        @functools.wraps(apply)
+        def adapted(self, item, spider, context=None):
+            if context is None:
+                # Called by an older apply, which has set the inputs as instance variables
+                context = ItemContext(**{argument: getattr(self, argument, None) for argument in self.INPUTS})
+            return apply(self, item, spider, context)
+    return adapted
+
+
 # TODO: Use ItemAdapter in all pipelines
 class BasePipeline:
     """
@@ -21,13 +71,18 @@ class BasePipeline:
         "url": "url"
     }
     ```
-    This means that the child pipeline expects the `prepare_inputs(self, item)` method to set `self.html` and
-    `self.url` to the correct item keys that contain this information for that ItemType.
-    So this is done on a per-item basis.
-    If a required instance variable is set to None by `prepare_inputs`, this means that the child pipeline doesn't need
-    to operate on this ItemType and should just skip it.
+    This means that the child pipeline expects the `get_context(self, item)` method to set `context.html` and
+    `context.url` to the values of the correct item keys that contain this information for that ItemType.
+    So this is done on a per-item basis, and the context is passed to `apply(self, item, spider, context)`. Since the
+    inputs are never stored on the pipeline instance, several items can be processed at the same time.
+    If a required input is set to None by `get_context`, this means that the child pipeline doesn't need to operate on
+    this ItemType and should just skip it.
+
+    Child pipelines that define the older `apply(self, item, spider)` still work. For those, the inputs are set as
+    instance variables, e.g. `self.html`, on a shallow copy of the pipeline made for each item. Both conventions can be
+    mixed in a class hierarchy, e.g. an older apply can call `super().apply(item, spider)` of a built-in pipeline.
 
-    `prepare_inputs(self, item)` knows how to find the correct item keys for each ItemType because the orchestrating
+    `get_context(self, item)` knows how to find the correct item keys for each ItemType because the orchestrating
     `assemble` function sets INPUTS for each pipeline, and it actually looks like this at runtime.
     ```
     INPUTS = {
@@ -38,17 +93,68 @@ class BasePipeline:
         }, # Sometimes, instead of using a dict, we use a callable. Use callable(item) to get the required key name.
         # Sometimes, we just use a value, meaning that all ItemTypes should use that value
 
-        # ... other required instance variables
+        # ... other required inputs
     }
     ```
+    Built-in pipelines with MIME_TYPES add (ItemType, MIME type) keys instead, e.g.
+    (ItemType.OTHER, "application/pdf"). `assemble` lists these in ROUTES, and an item whose ItemType and MIME type are
+    in ROUTES only uses the inputs of that key, so it skips the pipelines that its built-in pipeline doesn't have.
     So the INPUTS that you see in the child pipeline definition is only an indication using defaults and a static item
     key (independent of ItemType). It will look different at runtime because it is dynamically modified by `assemble`
     before the scraping process launches.
     """
     INPUTS = {}
+    # (ItemType, MIME type) keys of INPUTS, set by `assemble`
+    ROUTES = frozenset()
+    # Pipelines set this item key to True to make all following langsearch pipelines pass the item through unchanged
+    SKIP = "base_pipeline_skip"
+    # Maximum number of threads running `apply` for this pipeline. If 0, `apply` runs on the reactor thread and blocks
+    # crawling until it returns. Network-bound pipelines set this, so that other items are processed while they wait.
+    THREAD_POOL_SIZE = 0
+    # Pure CPU pipelines set this, so that `assemble(..., process_pool=True)` runs them in worker processes
+    CPU_BOUND = False
+    # Maximum time in seconds that `apply` may take for one item. If greater than 0, `apply` runs in a worker process,
+    # which is killed when the budget is exceeded, with None as the spider. Only for pipelines that can be pickled and
+    # whose `apply` returns the item and keeps no state between items, e.g. the extraction pipelines.
+    TIME_BUDGET = 0
+    # What happens to an item when the budget is exceeded: "drop" drops it, "skip" passes it on unchanged
+    ON_BUDGET_EXCEEDED = "drop"
+    # Item key with the names of the pipelines that skipped the item because their budget was exceeded
+    BUDGET_EXCEEDED = "base_pipeline_budget_exceeded"
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.thread_pool = None
+        self.time_budget = 0
+        self.on_budget_exceeded = "drop"
+        self.stats = None
+        self.budget_workers = None
+
+    def __getstate__(self):
+        # Pipelines are pickled to run in worker processes. Threads, processes and the Scrapy stats stay in this
+        # process. INPUTS and ROUTES, which `assemble` sets on the class, go with the instance, since worker processes
+        # don't run `assemble`.
+        state = self.__dict__.copy()
+        state.update(thread_pool=None, stats=None, budget_workers=None, INPUTS=self.INPUTS, ROUTES=self.ROUTES)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.time_budget > 0:
+            from langsearch.pipelines.budget import BudgetWorkerPool
+
+            self.budget_workers = BudgetWorkerPool(self)
+
+    def __copy__(self):
+        # Unlike pickling, a copy shares the threads and stats of the pipeline
+        pipeline = self.__class__.__new__(self.__class__)
+        pipeline.__dict__.update(self.__dict__)
+        return pipeline
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "apply" in cls.__dict__:
+            cls.apply = adapt_apply(cls.__dict__["apply"])
 
     @classmethod
     def get_setting_from_partial_key(cls, settings_obj, partial_key, default_class_var=None):
@@ -89,38 +195,131 @@ class BasePipeline:
             params = json.load(f)
         return params
 
+    def open_spider(self, spider):
+        thread_pool_size = self.__class__.get_setting_from_partial_key(spider.settings, "THREAD_POOL_SIZE")
+        try:
+            thread_pool_size = int(thread_pool_size)
+        except ValueError:
+            raise SettingsError(
+                f"setting with partial key THREAD_POOL_SIZE of class {self.__class__} "
+                f"must be convertible to int, but got '{thread_pool_size}'"
+            )
+        if thread_pool_size > 0:
+            from twisted.internet import reactor
+            from twisted.python.threadpool import ThreadPool
+
+            self.thread_pool = ThreadPool(minthreads=0, maxthreads=thread_pool_size, name=self.__class__.__name__)
+            self.thread_pool.start()
+            reactor.addSystemEventTrigger("during", "shutdown", self.thread_pool.stop)
+        self.configure_time_budget(spider)
+
+    def configure_time_budget(self, spider):
+        time_budget = self.__class__.get_setting_from_partial_key(spider.settings, "TIME_BUDGET")
+        try:
+            self.time_budget = float(time_budget)
+        except ValueError:
+            raise SettingsError(
+                f"setting with partial key TIME_BUDGET of class {self.__class__} "
+                f"must be convertible to float, but got '{time_budget}'"
+            )
+        self.on_budget_exceeded = self.__class__.get_setting_from_partial_key(spider.settings, "ON_BUDGET_EXCEEDED")
+        if self.on_budget_exceeded not in ("drop", "skip"):
+            raise SettingsError(
+                f"setting with partial key ON_BUDGET_EXCEEDED of class {self.__class__} "
+                f"must be 'drop' or 'skip', but got '{self.on_budget_exceeded}'"
+            )
+        crawler = getattr(spider, "crawler", None)
+        if crawler is not None:
+            self.stats = crawler.stats
+        if self.time_budget > 0:
+            from langsearch.pipelines.budget import BudgetWorkerPool
+
+            self.budget_workers = BudgetWorkerPool(self)
+
     def process_item(self, item, spider):
-        self.prepare_inputs(item)
-        item = self.apply(item, spider)
-        return item
+        if item.get(self.SKIP, False):
+            return item
+        apply = functools.partial(self.apply_item, item, spider)
+        if self.thread_pool is not None:
+            from twisted.internet import reactor, threads
 
-    def prepare_inputs(self, item):
+            return threads.deferToThreadPool(reactor, self.thread_pool, apply)
+        if self.time_budget > 0:
+            from twisted.internet import threads
+
+            # Waiting for the worker process must not block the reactor
+            return threads.deferToThread(apply)
+        return apply()
+
+    def apply_item(self, item, spider):
+        """
+        Runs `apply` for `item` in the calling thread, in a worker process if the pipeline has a time budget.
+        """
+        context = self.get_context(item)
+        if self.time_budget > 0:
+            return self.apply_with_budget(item, context)
+        return self.apply(item, spider, context)
+
+    def apply_with_budget(self, item, context):
+        try:
+            return self.budget_workers.run_with_budget(item, context, self.time_budget)
+        except TimeoutError:
+            name = self.__class__.__name__
+            if self.stats is not None:
+                self.stats.inc_value(f"{name}/budget_exceeded")
+            url = getattr(item.get("response"), "url", None)
+            if self.on_budget_exceeded == "skip":
+                logger.warning(f"{name} exceeded its time budget of {self.time_budget} seconds for url {url}, skipping")
+                item[self.BUDGET_EXCEEDED] = item.get(self.BUDGET_EXCEEDED, []) + [name]
+                return item
+            raise BudgetExceeded(
+                name, f"{name} exceeded its time budget of {self.time_budget} seconds for url {url}"
+            )
+
+    def get_route(self, item):
+        """
+        Returns the key of INPUTS that applies to `item`, i.e. (ItemType, MIME type) if that is a route, else ItemType.
+        """
+        route = (item["type"], item.get("mime_type"))
+        if route in self.ROUTES:
+            return route
+        return item["type"]
+
+    def get_context(self, item):
+        context = ItemContext()
         for argument, item_type_and_key in self.INPUTS.items():
             if not isinstance(item_type_and_key, dict):
                 key = item_type_and_key
             else:
                 try:
-                    key = item_type_and_key[item["type"]]
+                    key = item_type_and_key[self.get_route(item)]
                 except KeyError:
-                    setattr(self, argument, None)
+                    setattr(context, argument, None)
                     continue
             if callable(key):
                 try:
                     value = key(item)
                 except:
-                    setattr(self, argument, None)
+                    setattr(context, argument, None)
                 else:
-                    setattr(self, argument, value)
+                    setattr(context, argument, value)
                 continue
             try:
                 value = item[key]
             except KeyError:
-                setattr(self, argument, None)
+                setattr(context, argument, None)
             else:
-                setattr(self, argument, value)
+                setattr(context, argument, value)
+        return context
+
+    def prepare_inputs(self, item):
+        """
+        Sets the inputs of `item` as instance variables. Only for pipelines with the older `apply(self, item, spider)`.
+        """
+        self.__dict__.update(vars(self.get_context(item)))
 
-    def apply(self, item, spider):
+    def apply(self, item, spider, context):
         """
-        Should check if it has the right instance variables set to carry out the processing. Otherwise, DropItem.
+        Should check if `context` has the right inputs set to carry out the processing. Otherwise, DropItem.
         """
         raise NotImplementedError
@@ -0,0 +1,170 @@
+from enum import Enum
+import pickle
+import threading
+
+from lxml import etree
+import lxml.html
+from scrapy.http import Response
+
+from langsearch.pipelines.base import ItemContext
+from langsearch.pipelines.chain import SlimResponse, get_mp_context
+
+# Seconds to wait for a worker process to exit when it is closed
+CLOSE_TIMEOUT = 5
+# Values of these types can't be changed in place, so comparing them by identity is enough
+IMMUTABLE_TYPES = (str, bytes, int, float, type(None), Enum)
+
+
+class SerializedTree:
+    """
+    Stand-in for a parsed lxml.html tree, which can't be pickled, on its way between processes.
+    """
+    def __init__(self, tree):
+        self.html = etree.tostring(tree, method="html", encoding=str)
+
+    def parse(self):
+        return etree.HTML(self.html, parser=lxml.html.html_parser)
+
+
+def pack(values):
+    """
+    Returns a copy of the dict `values` that can be pickled, with SerializedTree for parsed trees and SlimResponse for
+    Scrapy responses.
+    """
+    packed = {}
+    for key, value in values.items():
+        if isinstance(value, etree._Element):
+            value = SerializedTree(value)
+        elif isinstance(value, Response):
+            value = SlimResponse.from_response(value)
+        packed[key] = value
+    return packed
+
+
+def unpack(values):
+    return {
+        key: value.parse() if isinstance(value, SerializedTree) else value for key, value in values.items()
+    }
+
+
+def _serve(pipeline, connection):
+    """
+    Main loop of a worker process. Runs `apply` of `pipeline` for each (item, inputs) it receives and sends back the
+    changes to the item. A value counts as changed if it was replaced, or if its pickle differs, e.g. because `apply`
+    appended to a list in it.
+    """
+    connection.send_bytes(b"")
+    while True:
+        try:
+            item, inputs = pickle.loads(connection.recv_bytes())
+        except EOFError:
+            return
+        item = unpack(item)
+        before = dict(item)
+        pickled = {
+            key: pickle.dumps(value) for key, value in pack(item).items() if not isinstance(value, IMMUTABLE_TYPES)
+        }
+        try:
+            result = pipeline.apply(item, None, ItemContext(**unpack(inputs)))
+            if result is not item:
+                raise TypeError(f"apply must return the item it was given to run with a budget, got {type(result)}")
+            changed = {
+                key: value for key, value in pack(item).items()
+                if key not in before or before[key] is not item[key]
+                or (key in pickled and pickle.dumps(value) != pickled[key])
+            }
+            removed = [key for key in before if key not in item]
+            message = pickle.dumps((True, (changed, removed)))
+        except Exception as e:
+            try:
+                message = pickle.dumps((False, e))
+            except Exception:
+                message = pickle.dumps((False, RuntimeError(repr(e))))
+        connection.send_bytes(message)
+
+
+class BudgetWorker:
+    """
+    A worker process that runs `apply` of a pipeline, which it gets pickled when it starts, for one item at a time.
+    """
+    def __init__(self, pipeline):
+        context = get_mp_context()
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_serve, args=(pipeline, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+        # Wait until the worker is ready, so that its start doesn't count against the budget of the first item
+        try:
+            self.connection.recv_bytes()
+        except EOFError:
+            self.process.join()
+            raise RuntimeError(f"Time budget worker process exited with code {self.process.exitcode} on start")
+
+    def run(self, item, context, budget):
+        """
+        Returns the (success, payload) tuple of the worker for `item` and `context`, or raises TimeoutError if the
+        worker doesn't answer within `budget` seconds.
+        """
+        self.connection.send_bytes(pickle.dumps((pack(item), pack(vars(context)))))
+        if not self.connection.poll(budget):
+            raise TimeoutError(f"Time budget of {budget} seconds exceeded")
+        try:
+            return pickle.loads(self.connection.recv_bytes())
+        except EOFError:
+            self.process.join()
+            raise RuntimeError(f"Time budget worker process exited with code {self.process.exitcode}")
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def close(self):
+        self.connection.close()
+        self.process.join(CLOSE_TIMEOUT)
+        if self.process.is_alive():
+            self.kill()
+
+
+class BudgetWorkerPool:
+    """
+    Runs `apply` of `pipeline` in worker processes with a time budget. Idle workers are reused, and a new worker is
+    started when all are busy, so there are at most as many workers as threads calling `run_with_budget` at the same
+    time. A worker that exceeds the budget or fails is killed. Workers are daemon processes, which exit with the
+    crawler process.
+    """
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def run_with_budget(self, item, context, budget):
+        """
+        Runs `apply(item, None, context)` of the pipeline, which must change `item` in place and return it, in a
+        worker process. The changes that the worker made to `item` are applied to `item` in this process.
+        Returns `item`, or raises TimeoutError if the budget is exceeded. Exceptions raised by `apply` are raised again.
+        """
+        with self.lock:
+            worker = self.idle.pop() if len(self.idle) > 0 else None
+        if worker is None:
+            worker = BudgetWorker(self.pipeline)
+        try:
+            success, payload = worker.run(item, context, budget)
+        except BaseException:
+            worker.kill()
+            raise
+        with self.lock:
+            self.idle.append(worker)
+        if not success:
+            raise payload
+        changed, removed = payload
+        for key in removed:
+            del item[key]
+        item.update(unpack(changed))
+        return item
+
+    def close(self):
+        with self.lock:
+            workers, self.idle = self.idle, []
+        for worker in workers:
+            worker.close()
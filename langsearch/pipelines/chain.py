@@ -0,0 +1,208 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import pickle
+
+from lxml import etree
+from scrapy.exceptions import DropItem
+from w3lib.encoding import html_to_unicode
+
+from langsearch.exceptions import BudgetExceeded, SettingsError
+from langsearch.pipelines.base import BasePipeline
+
+logger = logging.getLogger(__name__)
+
+
+class SlimResponse:
+    """
+    Picklable stand-in for a Scrapy response, with the attributes that the extraction pipelines read.
+    """
+    def __init__(self, url, body, encoding=None):
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self._text = None
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.url, response.body, getattr(response, "encoding", None))
+
+    @property
+    def text(self):
+        if self.encoding is None:
+            raise AttributeError("Response content isn't text")
+        if self._text is None:
+            # Same decoding as scrapy.http.TextResponse.text
+            self._text = html_to_unicode(f"charset={self.encoding}", self.body)[1]
+        return self._text
+
+
+def get_mp_context():
+    """
+    Returns the multiprocessing context for worker processes. The crawler process runs threads, e.g. of the reactor's
+    thread pool, so a forked worker could start with a lock held by another thread and hang. Workers are therefore
+    started by a fork server, or spawned where there is none.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class WorkerSpider:
+    """
+    Picklable stand-in for the spider in worker processes, passed to `open_spider` of the pipelines there. It has the
+    name of the spider and its langsearch settings, i.e. the ones starting with LANGSEARCH_, but no crawler, so stats
+    counted in worker processes are lost.
+    """
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+
+    @classmethod
+    def from_spider(cls, spider):
+        settings = {}
+        for key, value in spider.settings.items():
+            if not key.startswith("LANGSEARCH_"):
+                continue
+            try:
+                pickle.dumps(value)
+            except Exception:
+                logger.warning(f"Setting {key} can't be pickled, so it is not available in worker processes")
+                continue
+            settings[key] = value
+        return cls(spider.name, settings)
+
+
+# Pipeline instances of the worker process, mapping each ItemType or route to its extraction chain
+_stages = None
+
+
+def _init_worker(stages, spider):
+    global _stages
+    opened = set()
+    for pipelines in stages.values():
+        for stage in pipelines:
+            if id(stage) not in opened:
+                stage.open_spider(spider)
+                opened.add(id(stage))
+    _stages = stages
+
+
+def _run_chain(route, item, drop_keys):
+    keys = set(item)
+    for stage in _stages[route]:
+        if item.get(stage.SKIP, False):
+            break
+        item = stage.apply_item(item, None)
+    # Parsed lxml trees can't be pickled
+    return {
+        key: value for key, value in item.items()
+        if key not in keys and key not in drop_keys and not isinstance(value, etree._Element)
+    }
+
+
+class ExtractionChainPipeline(BasePipeline):
+    """
+    Runs the CPU-bound pipelines of each ItemType in one hop in a pool of worker processes, so that extraction uses
+    more than one core and doesn't block the reactor.
+
+    `assemble(..., process_pool=True)` creates a subclass with STAGES, mapping each ItemType or (ItemType, MIME type)
+    route to its CPU-bound pipelines in order, and DROP_KEYS, the intermediate item keys that only these pipelines
+    read. The item is sent to a worker without the Scrapy response, and only the new item keys that are not in
+    DROP_KEYS and don't hold parsed trees come back.
+
+    Worker processes are started with `get_mp_context()` and get pickled copies of the pipelines, whose `open_spider`
+    is called with a WorkerSpider. In worker processes, `apply` is called with None as the spider.
+    """
+    STAGES = {}
+    DROP_KEYS = frozenset()
+    # Number of worker processes. If 0, one per CPU.
+    PROCESS_POOL_SIZE = 0
+
+    def __init__(self, stages, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stages = stages
+        self.executor = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy.utils.misc import create_instance
+
+        instances = {}
+        for pipelines in cls.STAGES.values():
+            for pipeline in pipelines:
+                if pipeline not in instances:
+                    instances[pipeline] = create_instance(pipeline, crawler.settings, crawler)
+        stages = {
+            route: [instances[pipeline] for pipeline in pipelines] for route, pipelines in cls.STAGES.items()
+        }
+        return cls(stages)
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        process_pool_size = self.__class__.get_setting_from_partial_key(spider.settings, "PROCESS_POOL_SIZE")
+        try:
+            process_pool_size = int(process_pool_size)
+        except ValueError:
+            raise SettingsError(
+                f"setting with partial key PROCESS_POOL_SIZE of class {self.__class__} "
+                f"must be convertible to int, but got '{process_pool_size}'"
+            )
+        self.executor = ProcessPoolExecutor(
+            max_workers=process_pool_size or None,
+            mp_context=get_mp_context(),
+            initializer=_init_worker,
+            initargs=(self.stages, WorkerSpider.from_spider(spider))
+        )
+
+    def close_spider(self, spider):
+        if self.executor is not None:
+            from twisted.internet import threads
+
+            # Waits for the items in flight, so it must not block the reactor
+            executor, self.executor = self.executor, None
+            return threads.deferToThread(executor.shutdown)
+
+    def process_item(self, item, spider):
+        if item.get(self.SKIP, False):
+            return item
+        if "type" not in item:
+            return item
+        route = self.get_route(item)
+        if len(self.stages.get(route, [])) == 0:
+            return item
+        from twisted.internet import defer, reactor
+
+        response = item["response"]
+        slim_item = {key: value for key, value in item.items() if key != "response"}
+        slim_item["response"] = SlimResponse.from_response(response)
+        deferred = defer.Deferred()
+        try:
+            future = self.executor.submit(_run_chain, route, slim_item, self.DROP_KEYS)
+        except:
+            message = f"Failed to submit item with url {response.url} to the extraction process pool"
+            logger.exception(message)
+            raise DropItem(message)
+        future.add_done_callback(lambda f: reactor.callFromThread(self.fire, f, item, deferred))
+        return deferred
+
+    def fire(self, future, item, deferred):
+        try:
+            result = future.result()
+        except BudgetExceeded as e:
+            if self.stats is not None:
+                self.stats.inc_value(f"{e.pipeline}/budget_exceeded")
+            deferred.errback(e)
+        except DropItem as e:
+            deferred.errback(e)
+        except:
+            message = f"Extraction process pool failed for url {item['response'].url}"
+            logger.exception(message)
+            deferred.errback(DropItem(message))
+        else:
+            if self.stats is not None:
+                # Stats counted in the workers are lost
+                for pipeline in result.get(self.BUDGET_EXCEEDED, []):
+                    self.stats.inc_value(f"{pipeline}/budget_exceeded")
+            item.update(result)
+            deferred.callback(item)
@@ -0,0 +1,89 @@
+import datetime
+import hashlib
+import logging
+
+from scrapy.exceptions import DropItem
+
+from langsearch.pipelines.base import BasePipeline
+from langsearch.pipelines.common.mixins.weaviatedb import WeaviateMixin
+from langsearch.pipelines.common.storeitem import BaseStoreItemPipeline, StoreItemPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class BaseFingerprintPipeline(BaseStoreItemPipeline):
+    """
+    Hashes the crawled bytes of an item and compares the hash to the one the StoreItemPipeline stored for the URL in
+    the crawl DB. If they match, the item hasn't changed since the last crawl. In that case, this pipeline refreshes
+    `last_seen` of the URL and makes all following langsearch pipelines skip the item, so that unchanged items are
+    never extracted, transcribed or indexed again.
+
+    This should be the first pipeline for each ItemType. It shares the class schema and settings of the
+    StoreItemPipeline: the SHARED_SETTINGS are resolved through STORE_ITEM_PIPELINE, so that e.g.
+    LANGSEARCH_STOREITEMPIPELINE_CLASS_SCHEMA applies to both, unless they are set for this pipeline itself.
+    """
+    INPUTS = {
+        "body": "body",
+        "url": "url"
+    }
+    BODY_FINGERPRINT = "fingerprint_pipeline_body_fingerprint"
+    # The pipeline that writes the crawl DB, or its dotted path
+    STORE_ITEM_PIPELINE = StoreItemPipeline
+    SHARED_SETTINGS = frozenset({
+        "CLASS_SCHEMA", "DUPLICATE_CUTOFF", "USE_SIMHASH", "STORE_TEXT", "WEAVIATE_BASE_URL", "WEAVIATE_POOL_SIZE"
+    })
+
+    @classmethod
+    def get_setting_from_partial_key(cls, settings_obj, partial_key, default_class_var=None):
+        if partial_key not in cls.SHARED_SETTINGS:
+            return super().get_setting_from_partial_key(settings_obj, partial_key, default_class_var)
+        if default_class_var is None:
+            default_class_var = partial_key
+        for this_cls in cls.mro():
+            if this_cls is BaseStoreItemPipeline:
+                break
+            value = settings_obj.get(f"LANGSEARCH_{this_cls.__name__.upper()}_{partial_key}")
+            if value is not None:
+                return value
+            if default_class_var in this_cls.__dict__:
+                return this_cls.__dict__[default_class_var]
+        store_item_pipeline = super().get_setting_from_partial_key(settings_obj, "STORE_ITEM_PIPELINE")
+        if isinstance(store_item_pipeline, str):
+            store_item_pipeline = cls.get_from_dotted(store_item_pipeline)
+        return store_item_pipeline.get_setting_from_partial_key(settings_obj, partial_key, default_class_var)
+
+    def process_item(self, item, spider):
+        # Never buffer, since the following pipelines depend on the result
+        return BasePipeline.process_item(self, item, spider)
+
+    def apply(self, item, spider, context):
+        if context.body is None:
+            return item
+        if context.url is None:
+            return item
+        body_fingerprint = hashlib.sha256(context.body).hexdigest()
+        item[self.BODY_FINGERPRINT] = body_fingerprint
+        try:
+            unique_id = self.weaviate.get_uuid(self.class_name, context.url)
+            stored = self.weaviate.client.data_object.get_by_id(unique_id, class_name=self.class_name)
+            if stored is None or stored["properties"].get("body_fingerprint") != body_fingerprint:
+                return item
+            self.weaviate.client.data_object.update(
+                class_name=self.class_name,
+                uuid=unique_id,
+                data_object={
+                    "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
+                }
+            )
+        except:
+            message = f"Error while fingerprinting item with URL {context.url}"
+            logger.exception(message)
+            raise DropItem(message)
+        logger.debug(f"Skipping unchanged item with URL {context.url}")
+        item[self.CHANGED] = False
+        item[self.SKIP] = True
+        return item
+
+
+class FingerprintPipeline(BaseFingerprintPipeline, WeaviateMixin):
+    pass
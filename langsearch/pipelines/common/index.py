@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import logging
 import os
 
@@ -48,6 +49,16 @@ class BaseSimpleIndexPipeline(BasePipeline):
                     }
                 },
             },
+            {
+                "name": "section_hash",
+                "description": "SHA-256 of the section text",
+                "dataType": ["string"],
+                "moduleConfig": {
+                    "text2vec-transformers": {
+                        "skip": True,
+                    }
+                },
+            },
             {
                 "name": "last_seen",
                 "description": "When this URL was last seen in the crawling process",
@@ -60,6 +71,10 @@ class BaseSimpleIndexPipeline(BasePipeline):
             }
         ],
     }
+    # The crawl DB records when a URL was last seen. If True, `last_seen` of all data objects of an unchanged URL is
+    # also rewritten, which costs one write per data object.
+    UPDATE_LAST_SEEN = False
+    THREAD_POOL_SIZE = 4
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -68,56 +83,101 @@ class BaseSimpleIndexPipeline(BasePipeline):
             class_schema = self.get_params_from_file(class_schema)
         self.class_schema = class_schema
         self.class_name = self.class_schema["class"]
-        if not self.weaviate.class_exists(self.class_name):
-            self.weaviate.create_class(self.class_schema)
+        self.weaviate.register_classes([self.class_schema])
+        update_last_seen = self.__class__.get_setting_from_partial_key(os.environ, "UPDATE_LAST_SEEN")
+        if isinstance(update_last_seen, str):
+            update_last_seen = update_last_seen.lower() in ("1", "true", "yes")
+        self.update_last_seen = update_last_seen
 
-    def create_or_change(self):
-        self.weaviate.client.batch.delete_objects(
-            class_name=self.class_name,
-            where={
-                "path": ["url"],
-                "operator": "Equal",
-                "valueString": self.url
-            }
-        )
-        self.weaviate.add(
-            class_name=self.class_name,
-            data=[
-                {
-                    "url": self.url,
-                    "section": section,
-                    "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                } for section in self.sections
-            ]
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.weaviate.ensure_registered_classes()
+        self.weaviate.ensure_properties(self.class_name, self.class_schema["properties"])
+
+    @staticmethod
+    def get_section_hash(section):
+        return hashlib.sha256(section.encode()).hexdigest()
+
+    def create_or_change(self, context):
+        """
+        Only deletes the sections of the URL that disappeared and only adds the new ones. Unchanged sections keep
+        their vectors, so they don't need to be vectorized again.
+        """
+        where_filter = {
+            "path": ["url"],
+            "operator": "Equal",
+            "valueString": context.url
+        }
+        sections = {self.get_section_hash(section): section for section in context.sections}
+        existing = list(self.weaviate.get_all(self.class_name, ["section_hash"], where_filter=where_filter))
+        kept = set()
+        deleted = []
+        for data_object in existing:
+            section_hash = data_object.get("section_hash")
+            if section_hash in sections and section_hash not in kept:
+                kept.add(section_hash)
+            else:
+                deleted.append(data_object["_additional"]["id"])
+        if len(kept) == 0 and len(deleted) > 0:
+            self.weaviate.client.batch.delete_objects(
+                class_name=self.class_name,
+                where=where_filter
+            )
+        else:
+            for unique_id in deleted:
+                self.weaviate.client.data_object.delete(
+                    uuid=unique_id,
+                    class_name=self.class_name
+                )
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.weaviate.upsert(
+            self.class_name,
+            [
+                (
+                    self.weaviate.get_uuid(self.class_name, context.url, section_hash),
+                    {
+                        "url": context.url,
+                        "section": section,
+                        "section_hash": section_hash,
+                        "last_seen": now
+                    }
+                ) for section_hash, section in sections.items() if section_hash not in kept
+            ],
+            batch_size=5
         )
+        logger.debug(f"Kept {len(kept)}, deleted {len(deleted)} and added {len(sections) - len(kept)} sections "
+                     f"for URL {context.url}"
+                     )
 
-    def apply(self, item, spider):
-        if not hasattr(self, "url"):
+    def apply(self, item, spider, context):
+        if context.url is None:
             return item
-        if not hasattr(self, "sections"):
+        if context.sections is None:
             return item
         try:
             # TODO: Check if sections for this URL exists; otherwise create them
-            if hasattr(self, "changed") and not self.changed:
+            if context.changed is not None and not context.changed:
+                if not self.update_last_seen:
+                    return item
                 self.weaviate.update_property_with_current_datetime(
                     class_name=self.class_name,
                     where_filter={
                         "path": ["url"],
                         "operator": "Equal",
-                        "valueString": self.url
+                        "valueString": context.url
                     },
                     property_name="last_seen"
                 )
             else:
-                self.create_or_change()
+                self.create_or_change(context)
             return item
         except:
-            message = f"Error while processing item with URL {self.url}"
+            message = f"Error while processing item with URL {context.url}"
             logger.exception(message)
             raise DropItem(message)
 
     def get_similar_sections(self, text, **kwargs):
-        result = self.weaviate.get_similar(self.class_name, text, ["url", "section", "last_seen"], **kwargs)
+        result = self.weaviate.get_similar(self.class_name, text, ["url", "section"], **kwargs)
         return [Document(page_content=item["section"], metadata={"source": item["url"]})
                 for item in result
                 ]
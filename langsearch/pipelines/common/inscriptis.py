@@ -1,8 +1,10 @@
 import logging
 
+from lxml import etree
 from scrapy.exceptions import DropItem
 from inscriptis import get_text, ParserConfig
 from inscriptis.css_profiles import CSS_PROFILES
+from inscriptis.html_engine import Inscriptis
 
 from langsearch.exceptions import SettingsError
 from langsearch.pipelines.base import BasePipeline
@@ -17,6 +19,7 @@ class InscriptisPipeline(BasePipeline):
         "url": "url"
     }
     EXTRACTED_TEXT = "inscriptis_pipeline_extracted_text"
+    CPU_BOUND = True
     PARSER_CONFIG = ParserConfig(css=CSS_PROFILES["strict"].copy())
 
     def __init__(self, parser_config, *args, **kwargs):
@@ -33,15 +36,19 @@ class InscriptisPipeline(BasePipeline):
             )
         return cls(parser_config)
 
-    def apply(self, item, spider):
-        if not hasattr(self, "html") or self.html is None:
+    def apply(self, item, spider, context):
+        if context.html is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            extracted_text = get_text(self.html, self.parser_config)
+            if isinstance(context.html, etree._Element):
+                # Already parsed by a previous pipeline
+                extracted_text = Inscriptis(context.html, self.parser_config).get_text()
+            else:
+                extracted_text = get_text(context.html, self.parser_config)
         except:
-            message = f"Inscriptis failed to extract text for url {self.url}"
+            message = f"Inscriptis failed to extract text for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
@@ -49,6 +56,6 @@ class InscriptisPipeline(BasePipeline):
                 item[self.EXTRACTED_TEXT] = extracted_text
                 return item
             else:
-                message = f"Inscriptis extraction returned a non-string for url {self.url}"
+                message = f"Inscriptis extraction returned a non-string for url {context.url}"
                 logger.warning(message)
                 raise DropItem(message)
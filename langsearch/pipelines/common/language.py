@@ -1,15 +1,43 @@
 import logging
+import re
 
-from langdetect import detect
 from scrapy.exceptions import DropItem
 
 from langsearch.pipelines.base import BasePipeline
 from langsearch.exceptions import SettingsError
+from langsearch.language import LangdetectDetector
+from langsearch.pipelines.types.enumerations import ItemType
 
 
 logger = logging.getLogger(__name__)
 
 
+HTML_LANG = re.compile(rb"<html\b[^>]*?\slang\s*=\s*[\"']?([A-Za-z]{2,3})\b", re.IGNORECASE)
+INVISIBLE = re.compile(rb"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(rb"<[^>]*>")
+WHITESPACE = re.compile(r"\s+")
+
+
+def get_declared_languages(response):
+    """
+    Returns the primary language subtags in the Content-Language header, e.g. ["en", "de"] for "en-US, de".
+    """
+    try:
+        value = response.headers["Content-Language"]
+    except KeyError:
+        return []
+    if value is None:
+        return []
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    languages = []
+    for language in value.split(","):
+        language = language.strip().split("-")[0].lower()
+        if language != "" and language not in languages:
+            languages.append(language)
+    return languages
+
+
 class LanguageFilterPipeline(BasePipeline):
     INPUTS = {
         "text": "text",
@@ -17,10 +45,24 @@ class LanguageFilterPipeline(BasePipeline):
     }
     ALLOWED_LANGUAGES = None
     LANGUAGE = "language_filter_pipeline_language"
+    # A langsearch.language.LanguageDetector. NgramProfileDetector is faster than the default.
+    DETECTOR_CLASS = LangdetectDetector
+    DETECTOR_CLASS_PARAMS = {}
 
-    def __init__(self, allowed_languages, *args, **kwargs):
+    def __init__(self, allowed_languages, detector, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.allowed_languages = allowed_languages
+        self.detector = detector
+
+    @classmethod
+    def get_detector(cls, settings):
+        detector_class = cls.get_setting_from_partial_key(settings, "DETECTOR_CLASS")
+        if isinstance(detector_class, str):
+            detector_class = cls.get_from_dotted(detector_class)
+        detector_class_params = cls.get_setting_from_partial_key(settings, "DETECTOR_CLASS_PARAMS")
+        if isinstance(detector_class_params, str):
+            detector_class_params = cls.get_params_from_file(detector_class_params)
+        return detector_class(**detector_class_params)
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -30,20 +72,27 @@ class LanguageFilterPipeline(BasePipeline):
                 f"setting with partial key ALLOWED_LANGUAGES of class {cls} must be a list or None, "
                 f"got {type(allowed_languages)}"
             )
-        return cls(allowed_languages)
+        return cls(allowed_languages, cls.get_detector(crawler.settings))
 
-    def apply(self, item, spider):
+    def apply(self, item, spider, context):
         if self.allowed_languages is None:
             return item
         else:
-            if not hasattr(self, "text") or self.text is None:
+            language = item.get(LanguagePrefilterPipeline.LANGUAGE)
+            if language is not None and language in self.allowed_languages:
+                # Already decided by LanguagePrefilterPipeline
+                item[self.LANGUAGE] = language
                 return item
-            if not hasattr(self, "url"):
+            if context.text is None:
+                return item
+            if context.url is None:
                 return item
             try:
-                language = detect(self.text)
+                language = self.detector.detect(context.text)
+                if language is None:
+                    raise ValueError("No features in text")
             except:
-                message = f"Language detection failed for url {self.url}"
+                message = f"Language detection failed for url {context.url}"
                 logger.exception(message)
                 raise DropItem(message)
             else:
@@ -51,6 +100,132 @@ class LanguageFilterPipeline(BasePipeline):
                     item[self.LANGUAGE] = language
                     return item
                 else:
-                    message = f"Language {language} not in allowed languages {self.allowed_languages} for url {self.url}"
+                    message = (
+                        f"Language {language} not in allowed languages {self.allowed_languages} "
+                        f"for url {context.url}"
+                    )
                     logger.info(message)
                     raise DropItem(message)
+
+
+class LanguagePrefilterPipeline(LanguageFilterPipeline):
+    """
+    Drops items in disallowed languages before any text is extracted from them. Put it right after
+    DetectItemTypePipeline in ITEM_PIPELINES. The language is decided from the Content-Language header, then from the
+    lang attribute of the <html> tag, then by running langdetect on a short sample of the text of text and HTML items.
+    Items whose language stays ambiguous pass through, and LanguageFilterPipeline decides on the extracted text.
+    Items whose language was decided here are not detected again by LanguageFilterPipeline.
+
+    ALLOWED_LANGUAGES defaults to LanguageFilterPipeline's. The detector is configured like LanguageFilterPipeline's,
+    with DETECTOR_CLASS and DETECTOR_CLASS_PARAMS.
+    """
+    ALLOWED_LANGUAGES = None
+    LANGUAGE = "language_prefilter_pipeline_language"
+    # Number of bytes at the start of the body searched for the <html> tag and sampled for text
+    SAMPLE_SIZE = 16384
+    # Minimum probability of the most likely language in the text sample
+    MIN_PROBABILITY = 0.95
+    # Minimum number of characters in the text sample
+    MIN_SAMPLE_LENGTH = 200
+
+    def __init__(self, allowed_languages, detector, sample_size, min_probability, min_sample_length, stats, *args,
+                 **kwargs):
+        super().__init__(allowed_languages, detector, *args, **kwargs)
+        self.sample_size = sample_size
+        self.min_probability = min_probability
+        self.min_sample_length = min_sample_length
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        allowed_languages = cls.get_setting_from_partial_key(crawler.settings, "ALLOWED_LANGUAGES")
+        if allowed_languages is None:
+            allowed_languages = LanguageFilterPipeline.get_setting_from_partial_key(
+                crawler.settings, "ALLOWED_LANGUAGES"
+            )
+        if not isinstance(allowed_languages, list) and allowed_languages is not None:
+            raise SettingsError(
+                f"setting with partial key ALLOWED_LANGUAGES of class {cls} must be a list or None, "
+                f"got {type(allowed_languages)}"
+            )
+        params = {}
+        for name, convert in (("SAMPLE_SIZE", int), ("MIN_PROBABILITY", float), ("MIN_SAMPLE_LENGTH", int)):
+            value = cls.get_setting_from_partial_key(crawler.settings, name)
+            try:
+                params[name.lower()] = convert(value)
+            except ValueError:
+                raise SettingsError(
+                    f"setting with partial key {name} of class {cls} must be convertible to {convert.__name__}, "
+                    f"but got '{value}'"
+                )
+        return cls(allowed_languages, cls.get_detector(crawler.settings), stats=crawler.stats, **params)
+
+    def get_sample(self, item):
+        """
+        Returns a sample of the text at the start of a text or HTML item, or None for other items.
+        """
+        response = item["response"]
+        prefix = response.body[:self.sample_size]
+        if item.get("type") == ItemType.HTML:
+            prefix = TAG.sub(b" ", INVISIBLE.sub(b" ", prefix))
+        elif item.get("type") != ItemType.TEXT:
+            return None
+        encoding = getattr(response, "encoding", None) or "utf-8"
+        try:
+            sample = prefix.decode(encoding, "ignore")
+        except LookupError:
+            sample = prefix.decode("utf-8", "ignore")
+        return WHITESPACE.sub(" ", sample).strip()
+
+    def get_language(self, item):
+        """
+        Returns the language of the item and how it was decided, or (None, None) if it is ambiguous.
+        """
+        response = item["response"]
+        declared = get_declared_languages(response)
+        if len(declared) == 1:
+            return declared[0], "header"
+        if len(declared) > 1:
+            # Several languages, keep the item if any of them is allowed
+            allowed = [language for language in declared if self.is_allowed(language)]
+            return (allowed[0] if len(allowed) > 0 else declared[0]), "header"
+        if item.get("type") == ItemType.HTML:
+            match = HTML_LANG.search(response.body[:self.sample_size])
+            if match is not None:
+                return match.group(1).decode().lower(), "html_lang"
+        sample = self.get_sample(item)
+        if sample is None or len(sample) < self.min_sample_length:
+            return None, None
+        try:
+            probabilities = self.detector.get_probabilities(sample)
+        except:
+            return None, None
+        if len(probabilities) == 0 or probabilities[0][1] < self.min_probability:
+            return None, None
+        return probabilities[0][0], "sample"
+
+    def is_allowed(self, language):
+        # Compares primary subtags too, since langdetect reports e.g. zh-cn where a header says zh
+        primary = language.split("-")[0]
+        return language in self.allowed_languages or primary in {
+            allowed.split("-")[0] for allowed in self.allowed_languages
+        }
+
+    def apply(self, item, spider, context):
+        if self.allowed_languages is None:
+            return item
+        language, source = self.get_language(item)
+        if language is None:
+            self.stats.inc_value(f"{self.__class__.__name__}/ambiguous")
+            return item
+        if not self.is_allowed(language):
+            self.stats.inc_value(f"{self.__class__.__name__}/dropped/{source}")
+            message = (
+                f"Language {language} ({source}) not in allowed languages {self.allowed_languages} "
+                f"for url {item['response'].url}"
+            )
+            logger.info(message)
+            raise DropItem(message)
+        self.stats.inc_value(f"{self.__class__.__name__}/allowed/{source}")
+        item[self.LANGUAGE] = language
+        return item
@@ -1,4 +1,5 @@
 import copy
+import functools
 import logging
 import os
 
@@ -9,7 +10,7 @@ from langchain.prompts import PromptTemplate
 
 
 from langsearch.exceptions import SettingsError
-from langsearch.utils import openai_length_function
+from langsearch.tokens import count_tokens, count_tokens_batch
 
 
 logger = logging.getLogger(__name__)
@@ -29,7 +30,7 @@ class RecursiveReduceSummaryMixin:
         "max_tokens": 512  # This should match SUMMARY_MAX_LENGTH
     }
     SUMMARY_LLM_MAX_CONTEXT_SIZE = 4096
-    SUMMARY_LLM_LENGTH_FUNCTION = openai_length_function
+    SUMMARY_LLM_LENGTH_FUNCTION = count_tokens
     SUMMARY_MAX_LENGTH = 512
     SUMMARY_PROMPT = PROMPT
 
@@ -71,35 +72,53 @@ class RecursiveReduceSummaryMixin:
             summary_llm_length_function = self.get_from_dotted(summary_llm_length_function)
         self.summary_llm_length_function = summary_llm_length_function
         summary_prompt = self.__class__.get_setting_from_partial_key(os.environ, "SUMMARY_PROMPT")
-        summary_prompt_template = PromptTemplate(template=summary_prompt, input_variables=["text"])
-        summary_prompt_length = self.summary_llm_length_function(
-            summary_prompt_template.format(**{input_var: "" for input_var in summary_prompt_template.input_variables})
-        )
-        # - 50 for safety
-        self.summarize_chain_max_stuff_tokens = (
-                self.summary_llm_max_context_size - summary_prompt_length - self.summary_max_length - 50
-        )
+        self.summary_prompt_template = PromptTemplate(template=summary_prompt, input_variables=["text"])
         self.summarize_chain = load_summarize_chain(
             llm=self.summary_llm,
-            prompt=summary_prompt_template,
+            prompt=self.summary_prompt_template,
             chain_type="stuff"
         )
-        # "\n\n" is used for joining docs in stuff document chain
-        self.join_length = self.summary_llm_length_function("\n\n")
 
-    def total_length(self, sections):
-        return (
-            sum([self.summary_llm_length_function(section) for section in sections]) +
-            self.join_length * (len(sections) - 1)
+    # The lengths below are counted on first use, after open_spider() has configured the tokenizer
+
+    @functools.cached_property
+    def summarize_chain_max_stuff_tokens(self):
+        summary_prompt_length = self.summary_llm_length_function(
+            self.summary_prompt_template.format(
+                **{input_var: "" for input_var in self.summary_prompt_template.input_variables}
+            )
         )
+        # - 50 for safety
+        return self.summary_llm_max_context_size - summary_prompt_length - self.summary_max_length - 50
+
+    @functools.cached_property
+    def join_length(self):
+        # "\n\n" is used for joining docs in stuff document chain
+        return self.summary_llm_length_function("\n\n")
+
+    def get_lengths(self, sections):
+        if self.summary_llm_length_function is count_tokens:
+            # Encodes the sections that are not cached in one batch
+            return count_tokens_batch(sections)
+        return [self.summary_llm_length_function(section) for section in sections]
+
+    def total_length(self, sections, section_lengths=None):
+        if section_lengths is None:
+            section_lengths = self.get_lengths(sections)
+        return sum(section_lengths) + self.join_length * (len(sections) - 1)
 
-    def summarize(self, sections):
-        while self.total_length(sections) > self.summary_max_length:
+    def summarize(self, sections, section_lengths=None):
+        """
+        `section_lengths` are the token counts of `sections`, e.g. from TextSplitterPipeline.get_summarizer_input. They
+        must be counted with the same tokenizer as SUMMARY_LLM_LENGTH_FUNCTION. If None, the sections are counted here.
+        """
+        if section_lengths is None:
+            section_lengths = self.get_lengths(sections)
+        while self.total_length(sections, section_lengths) > self.summary_max_length:
             summaries = []
             docs = []
             count = 0
-            for section in sections:
-                section_length = self.summary_llm_length_function(section)
+            for section, section_length in zip(sections, section_lengths):
                 count += section_length + self.join_length
                 if count > self.summarize_chain_max_stuff_tokens:
                     summary = self.summarize_chain.run(docs).strip("\n")
@@ -111,4 +130,5 @@ class RecursiveReduceSummaryMixin:
             summary = self.summarize_chain.run(docs).strip("\n")
             summaries.append(summary)
             sections = summaries
+            section_lengths = self.get_lengths(sections)
         return "\n\n".join(sections)
@@ -1,18 +1,23 @@
 import datetime
 import logging
 import os
+import threading
 import time
 
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, HTTPError
 from weaviate import Client
-from weaviate.util import image_encoder_b64
+from weaviate.exceptions import UnexpectedStatusCodeException
+from weaviate.util import generate_uuid5, image_encoder_b64
+
+from langsearch.exceptions import SettingsError
 
 
 logger = logging.getLogger(__name__)
 
 
 class WeaviateDB:
-    def __init__(self, base_url):
+    def __init__(self, base_url, pool_size=None):
         # TODO: Added timeout for docker compose like setup. Look for a better solution.
         # TODO: Use `startup_period` argument of `weaviate.Client` when it becomes available.
         for _i in range(20):
@@ -22,23 +27,228 @@ class WeaviateDB:
                 time.sleep(1)
             else:
                 break
+        # Cache of the Weaviate schema, mapping class names to class schemas. Loaded lazily by get_classes().
+        self._classes = None
+        self._schema_lock = threading.Lock()
+        # Class schemas registered by the pipelines, which ensure_registered_classes() creates in one pass
+        self._registered = []
+        # The client has a single batch object with a buffer, which pipeline threads must not use at the same time
+        self._batch_lock = threading.Lock()
+        if pool_size is not None:
+            self.configure_pool(pool_size)
+
+    def configure_pool(self, pool_size):
+        """
+        Mounts a keep-alive connection pool of size `pool_size` on the HTTP session used by the Weaviate client.
+        """
+        session = getattr(getattr(self.client, "_connection", None), "_session", None)
+        if session is None:
+            logger.warning("Weaviate client does not expose an HTTP session, using its default connection pool")
+            return
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    def get_classes(self):
+        """
+        Returns a dict mapping class names to class schemas. The schema is fetched from Weaviate only once and then
+        served from the cache until `invalidate_schema()` or `refresh_schema()` is called.
+        """
+        with self._schema_lock:
+            if self._classes is None:
+                schema = self.client.schema.get()
+                self._classes = {c["class"]: c for c in schema["classes"]}
+            return self._classes
+
+    def invalidate_schema(self):
+        with self._schema_lock:
+            self._classes = None
+
+    def refresh_schema(self):
+        self.invalidate_schema()
+        return self.get_classes()
 
     def class_exists(self, class_name):
-        schema = self.client.schema.get()
-        classes = [c["class"] for c in schema["classes"]]
-        return class_name in classes
+        return class_name in self.get_classes()
 
     def create_class(self, class_schema):
         self.client.schema.create_class(class_schema)
+        self.add_to_schema_cache([class_schema])
+
+    def ensure_classes(self, class_schemas):
+        """
+        Creates all classes in `class_schemas` that don't exist yet in one pass.
+        """
+        missing = [c for c in class_schemas if not self.class_exists(c["class"])]
+        if len(missing) == 0:
+            return
+        try:
+            self.client.schema.create({"classes": missing})
+        except UnexpectedStatusCodeException:
+            # Another crawler process may have created some of the classes in the meantime
+            classes = self.refresh_schema()
+            still_missing = [c for c in missing if c["class"] not in classes]
+            if len(still_missing) > 0:
+                raise
+        self.add_to_schema_cache(missing)
+
+    def register_classes(self, class_schemas):
+        """
+        Registers `class_schemas` to be created by the next call of `ensure_registered_classes()`. Pipelines register
+        their classes when they are created and ensure them when they are opened, so that the first pipeline that is
+        opened creates the missing classes of all pipelines with one request.
+        """
+        with self._schema_lock:
+            self._registered.extend(class_schemas)
+
+    def ensure_registered_classes(self):
+        with self._schema_lock:
+            registered, self._registered = self._registered, []
+        # Pipelines that share a class, e.g. StoreItemPipeline and FingerprintPipeline, register it more than once
+        class_schemas = list({class_schema["class"]: class_schema for class_schema in registered}.values())
+        self.ensure_classes(class_schemas)
+
+    def ensure_properties(self, class_name, properties):
+        """
+        Adds the properties in `properties` that are missing from the existing class `class_name`. This migrates classes
+        created with an older class schema.
+        """
+        existing = {p["name"] for p in self.get_classes()[class_name].get("properties", [])}
+        missing = [p for p in properties if p["name"] not in existing]
+        for class_property in missing:
+            self.client.schema.property.create(class_name, class_property)
+        if len(missing) > 0:
+            self.invalidate_schema()
+
+    def add_to_schema_cache(self, class_schemas):
+        with self._schema_lock:
+            if self._classes is not None:
+                for class_schema in class_schemas:
+                    self._classes[class_schema["class"]] = class_schema
+
+    @staticmethod
+    def get_uuid(class_name, *keys):
+        """
+        Returns the deterministic uuid of the data object of class `class_name` identified by `keys`, e.g. its URL.
+        Writing to this uuid replaces the data object, so writes don't need to look it up first.
+        """
+        return generate_uuid5("\n".join(keys), class_name)
+
+    def migrate_to_uuids(self, class_name, key_properties=("url",)):
+        """
+        Moves the data objects of class `class_name` that older versions stored under random uuids to the deterministic
+        uuid of their `key_properties`, keeping all their properties, e.g. a summary doesn't need to be generated again.
+        Of several data objects with the same keys, one is kept and the others are deleted. This scans the whole class,
+        so it is run once after upgrading with `python -m langsearch.migrate`, not by the pipelines.
+        Returns the number of data objects that were moved or deleted.
+        """
+        legacy = []
+        migrated = set()
+        for data_object in self.iter_objects(class_name):
+            keys = [data_object.get("properties", {}).get(key_property) for key_property in key_properties]
+            if any(key is None for key in keys):
+                continue
+            unique_id = self.get_uuid(class_name, *keys)
+            if data_object["id"] == unique_id:
+                migrated.add(unique_id)
+            else:
+                legacy.append((data_object["id"], unique_id))
+        for legacy_id, unique_id in legacy:
+            if unique_id not in migrated:
+                stored = self.client.data_object.get_by_id(legacy_id, class_name=class_name)
+                if stored is not None:
+                    self.upsert(class_name, [(unique_id, stored["properties"])])
+                    migrated.add(unique_id)
+            self.client.data_object.delete(uuid=legacy_id, class_name=class_name)
+        return len(legacy)
 
     def add(self, class_name, data, batch_size=5):
-        self.client.batch.configure(batch_size=batch_size)
-        with self.client.batch as batch:
-            for data_object in data:
-                batch.add_data_object(
-                    class_name=class_name,
-                    data_object=data_object
-                )
+        with self._batch_lock:
+            self.client.batch.configure(batch_size=batch_size)
+            with self.client.batch as batch:
+                for data_object in data:
+                    batch.add_data_object(
+                        class_name=class_name,
+                        data_object=data_object
+                    )
+
+    def upsert(self, class_name, data, batch_size=100):
+        """
+        Writes `data`, a list of (uuid, data_object) tuples, through the batch API. An object with the uuid of an
+        existing object replaces that object, and a uuid of None creates a new object.
+        Raises RuntimeError if Weaviate reports an error for any of the objects.
+        """
+        errors = []
+
+        def collect_errors(results):
+            for result in results or []:
+                if "errors" in result.get("result", {}):
+                    errors.append(result["result"]["errors"])
+
+        with self._batch_lock:
+            self.client.batch.configure(batch_size=batch_size, callback=collect_errors)
+            with self.client.batch as batch:
+                for unique_id, data_object in data:
+                    batch.add_data_object(
+                        class_name=class_name,
+                        data_object=data_object,
+                        uuid=unique_id
+                    )
+        if len(errors) > 0:
+            raise RuntimeError(f"Weaviate batch failed for {len(errors)} objects in class {class_name}: {errors[0]}")
+
+    def iter_objects(self, class_name, page_size=100):
+        """
+        Yields all data objects of class `class_name` with their id and properties, fetching them in pages of
+        `page_size` with the cursor API. Unlike offset paging, it isn't limited to QUERY_MAXIMUM_RESULTS objects, but it
+        can't filter.
+        """
+        after = None
+        while True:
+            params = {"class": class_name, "limit": page_size}
+            if after is not None:
+                params["after"] = after
+            response = self.client._connection.get(path="/objects", params=params)
+            if response.status_code != 200:
+                raise UnexpectedStatusCodeException(f"List data objects of class {class_name}", response)
+            data_objects = response.json().get("objects") or []
+            yield from data_objects
+            if len(data_objects) < page_size:
+                return
+            after = data_objects[-1]["id"]
+
+    def delete_by_url(self, class_name, url):
+        """
+        Deletes all data objects of class `class_name` with `url`.
+        """
+        self.client.batch.delete_objects(
+            class_name=class_name,
+            where={
+                "path": ["url"],
+                "operator": "Equal",
+                "valueString": url
+            }
+        )
+
+    def get_all(self, class_name, properties, where_filter=None, page_size=100):
+        """
+        Yields all data objects of class `class_name` matching `where_filter`, fetching them in pages of `page_size`.
+        """
+        offset = 0
+        while True:
+            query = (
+                self.client.query
+                .get(class_name, properties)
+                .with_additional(["id"])
+            )
+            if where_filter is not None:
+                query = query.with_where(where_filter)
+            result = query.with_limit(page_size).with_offset(offset).do()
+            data_objects = result["data"]["Get"][class_name]
+            yield from data_objects
+            if len(data_objects) < page_size:
+                return
+            offset += page_size
 
     def update_property_with_current_datetime(self, class_name, where_filter, property_name):
         result = (
@@ -90,10 +300,40 @@ class WeaviateDB:
         return result["data"]["Get"][class_name]
 
 
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_weaviate_db(base_url, pool_size=None):
+    """
+    Returns the WeaviateDB for `base_url`, creating it on first use.
+    There is one WeaviateDB per base URL and process, so all pipelines share the same client, HTTP session and
+    connection pool, and only the first pipeline waits for Weaviate to come up.
+    """
+    key = base_url.rstrip("/")
+    with _databases_lock:
+        try:
+            return _databases[key]
+        except KeyError:
+            db = WeaviateDB(base_url, pool_size=pool_size)
+            _databases[key] = db
+            return db
+
+
 class WeaviateMixin:
     WEAVIATE_BASE_URL = "http://localhost:8080"
+    WEAVIATE_POOL_SIZE = 10
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         weaviate_base_url = self.__class__.get_setting_from_partial_key(os.environ, "WEAVIATE_BASE_URL")
-        self.weaviate = WeaviateDB(weaviate_base_url)
+        weaviate_pool_size = self.__class__.get_setting_from_partial_key(os.environ, "WEAVIATE_POOL_SIZE")
+        if isinstance(weaviate_pool_size, str):
+            try:
+                weaviate_pool_size = int(weaviate_pool_size)
+            except ValueError:
+                raise SettingsError(
+                    f"setting with partial key WEAVIATE_POOL_SIZE of class {self.__class__} "
+                    f"must be convertible to int, but got '{weaviate_pool_size}'"
+                )
+        self.weaviate = get_weaviate_db(weaviate_base_url, pool_size=weaviate_pool_size)
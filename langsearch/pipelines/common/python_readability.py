@@ -1,7 +1,9 @@
 import logging
 
 from lxml import etree
+import lxml.html
 from readability import Document
+from readability.cleaners import html_cleaner
 from scrapy.exceptions import DropItem
 
 from langsearch.pipelines.base import BasePipeline
@@ -10,31 +12,52 @@ from langsearch.pipelines.base import BasePipeline
 logger = logging.getLogger(__name__)
 
 
+class TreeDocument(Document):
+    """
+    A readability Document that also accepts a parsed lxml.html tree, which saves serializing and parsing it again.
+    """
+    def _parse(self, input):
+        if not isinstance(input, etree._Element):
+            return super()._parse(input)
+        # Returns a cleaned copy, so the tree can be parsed again
+        doc = html_cleaner.clean_html(input)
+        if self.url:
+            doc.make_links_absolute(self.url, resolve_base_href=True, handle_failures=self.handle_failures)
+        else:
+            doc.resolve_base_href(handle_failures=self.handle_failures)
+        return doc
+
+
 class PythonReadabilityPipeline(BasePipeline):
     INPUTS = {
         "html": "html",
         "url": "url"
     }
     HTML_WITHOUT_BP = "python_readability_pipeline_text_without_bp"
+    # The parsed lxml.html tree of HTML_WITHOUT_BP
+    PARSED_HTML_WITHOUT_BP = "python_readability_pipeline_parsed_html_without_bp"
+    CPU_BOUND = True
 
-    def apply(self, item, spider):
-        if not hasattr(self, "html") or self.html is None:
+    def apply(self, item, spider, context):
+        if context.html is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            html_without_bp = Document(self.html).summary()
+            html_without_bp = TreeDocument(context.html).summary()
         except:
-            message = f"Python-readability failed to remove boilerplate for url {self.url}"
+            message = f"Python-readability failed to remove boilerplate for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
             try:
-                parsed = etree.HTML(html_without_bp)
+                parsed = etree.HTML(html_without_bp, parser=lxml.html.html_parser)
             except:
-                message = f"Python-readability did not return valid HTML for {self.url}"
+                message = f"Python-readability did not return valid HTML for {context.url}"
                 logger.exception(message)
                 raise DropItem(message)
             else:
                 item[self.HTML_WITHOUT_BP] = html_without_bp
+                if parsed is not None:
+                    item[self.PARSED_HTML_WITHOUT_BP] = parsed
                 return item
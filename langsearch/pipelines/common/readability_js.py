@@ -1,38 +1,71 @@
 import logging
 
 from lxml import etree
-from readabilipy import simple_json_from_html_string
 from scrapy.exceptions import DropItem
 
+from langsearch.exceptions import SettingsError
 from langsearch.pipelines.base import BasePipeline
+from langsearch.pipelines.common.readability_worker import NodeReadabilityPool
 
 
 logger = logging.getLogger(__name__)
 
 
 class ReadabilityJSPipeline(BasePipeline):
+    """
+    Removes boilerplate with Readability.js, which readabilipy installs. Documents are sent to a pool of long-lived
+    Node.js workers instead of starting Node.js for each document.
+    """
     INPUTS = {
         "html": "html",
         "url": "url"
     }
     HTML_WITHOUT_BP = "readability_js_pipeline_text_without_bp"
+    # Threads waiting for the Node.js workers. Several documents in flight keep the workers busy.
+    THREAD_POOL_SIZE = 4
+    # Number of Node.js workers
+    POOL_SIZE = 2
+    # A Node.js worker is replaced after this many documents
+    MAX_DOCUMENTS = 500
+    # Maximum time in seconds for one document
+    TIMEOUT = 30
 
-    def apply(self, item, spider):
-        if not hasattr(self, "html") or self.html is None:
+    def __init__(self, pool_size, max_documents, timeout, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = NodeReadabilityPool(pool_size, max_documents, timeout)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        params = {}
+        for name in ("POOL_SIZE", "MAX_DOCUMENTS", "TIMEOUT"):
+            value = cls.get_setting_from_partial_key(crawler.settings, name)
+            try:
+                params[name.lower()] = int(value)
+            except ValueError:
+                raise SettingsError(
+                    f"setting with partial key {name} of class {cls} must be convertible to int, but got '{value}'"
+                )
+        return cls(**params)
+
+    def close_spider(self, spider):
+        self.pool.close()
+
+    def apply(self, item, spider, context):
+        if context.html is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            html_without_bp = simple_json_from_html_string(self.html, use_readability=True)["content"]
+            html_without_bp = self.pool.extract(context.html)
         except:
-            message = f"Readability JS failed to remove boilerplate for url {self.url}"
+            message = f"Readability JS failed to remove boilerplate for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
             try:
                 parsed = etree.HTML(html_without_bp)
             except:
-                message = f"Readability JS did not return valid HTML for {self.url}"
+                message = f"Readability JS did not return valid HTML for {context.url}"
                 logger.exception(message)
                 raise DropItem(message)
             else:
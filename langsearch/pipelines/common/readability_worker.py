@@ -0,0 +1,192 @@
+from concurrent.futures import Future, TimeoutError
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+
+import readabilipy
+
+logger = logging.getLogger(__name__)
+
+
+# readabilipy ships Readability.js in this directory and installs jsdom in its node_modules
+JAVASCRIPT_DIR = os.path.join(os.path.dirname(readabilipy.__file__), "javascript")
+
+# Writes {"ready": true} once Readability.js and jsdom are loaded. Then reads one JSON request {"id", "html"} per line
+# from stdin and writes one JSON response {"id", "content"} or {"id", "error"} per line to stdout, in the order of the
+# requests
+SCRIPT = """
+const readline = require("readline");
+const { JSDOM } = require("jsdom");
+const Readability = require("./Readability.js");
+const lines = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+lines.on("line", (line) => {
+    let id = null;
+    let response;
+    try {
+        const request = JSON.parse(line);
+        id = request.id;
+        const dom = new JSDOM(request.html);
+        const article = new Readability(dom.window.document).parse();
+        response = { id: id, content: article ? article.content : null };
+    } catch (e) {
+        response = { id: id, error: String(e) };
+    }
+    process.stdout.write(JSON.stringify(response) + "\\n");
+});
+process.stdout.write(JSON.stringify({ ready: true }) + "\\n");
+"""
+
+
+class NodeReadabilityWorker:
+    """
+    A long-lived Node.js process running Readability.js. Requests are written to its stdin without waiting for the
+    previous responses, and a reader thread resolves the future of each request when its response arrives. The worker
+    handles the requests in order, so a request is started when the worker is ready and the response to the one
+    before it has arrived.
+    """
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ["node", "-e", SCRIPT],
+            cwd=JAVASCRIPT_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            encoding="utf-8"
+        )
+        # Futures of the requests in the order they were sent, and events set when the worker starts each request
+        self.pending = {}
+        self.started = {}
+        self.documents = 0
+        # Set by the reader thread when the worker has loaded Readability.js and when its output ends
+        self.ready = False
+        self.exited = False
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self.read, name="NodeReadabilityWorker", daemon=True)
+        self.reader.start()
+
+    def submit(self, request_id, html):
+        """
+        Sends `html` to the worker. Returns an event that is set when the worker starts the request and a future of
+        its result.
+        """
+        future = Future()
+        started = threading.Event()
+        with self.lock:
+            if self.exited:
+                raise RuntimeError("Node readability worker is not running")
+            if self.ready and len(self.pending) == 0:
+                started.set()
+            self.pending[request_id] = future
+            self.started[request_id] = started
+            self.documents += 1
+            try:
+                self.process.stdin.write(json.dumps({"id": request_id, "html": html}) + "\n")
+                self.process.stdin.flush()
+            except OSError as e:
+                del self.pending[request_id]
+                del self.started[request_id]
+                raise RuntimeError("Node readability worker is not running") from e
+        return started, future
+
+    def read(self):
+        for line in self.process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                logger.warning(f"Unexpected output from Node readability worker: {line!r}")
+                continue
+            if response.get("ready", False):
+                with self.lock:
+                    self.ready = True
+                    if len(self.started) > 0:
+                        next(iter(self.started.values())).set()
+                continue
+            with self.lock:
+                future = self.pending.pop(response["id"], None)
+                self.started.pop(response["id"], None)
+                if len(self.started) > 0:
+                    next(iter(self.started.values())).set()
+            if future is None:
+                continue
+            if "error" in response:
+                future.set_exception(RuntimeError(f"Readability.js failed: {response['error']}"))
+            else:
+                future.set_result(response["content"])
+        with self.lock:
+            self.exited = True
+            pending, self.pending = self.pending, {}
+            started, self.started = self.started, {}
+        for event in started.values():
+            event.set()
+        for future in pending.values():
+            future.set_exception(RuntimeError(f"Node readability worker exited with code {self.process.wait()}"))
+
+    def close(self):
+        """
+        Lets the worker finish the pending requests and exit.
+        """
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def kill(self):
+        self.process.kill()
+
+
+class NodeReadabilityPool:
+    """
+    A pool of `size` NodeReadabilityWorkers. A worker is replaced after `max_documents` documents, so that memory
+    leaks in jsdom don't accumulate, and when a document takes longer than `timeout` seconds. The timeout starts when
+    the worker starts the document, not while it waits behind other documents.
+    """
+    def __init__(self, size, max_documents, timeout):
+        self.size = size
+        self.max_documents = max_documents
+        self.timeout = timeout
+        self.workers = []
+        self.request_ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def get_worker(self):
+        with self.lock:
+            for worker in list(self.workers):
+                if worker.process.poll() is not None:
+                    self.workers.remove(worker)
+                elif worker.documents >= self.max_documents:
+                    self.workers.remove(worker)
+                    worker.close()
+            if len(self.workers) < self.size:
+                worker = NodeReadabilityWorker()
+                self.workers.append(worker)
+                return worker
+            return min(self.workers, key=lambda w: len(w.pending))
+
+    def remove(self, worker):
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+    def extract(self, html):
+        """
+        Returns the article HTML that Readability.js extracts from `html`, or None if it didn't find an article.
+        """
+        worker = self.get_worker()
+        started, future = worker.submit(next(self.request_ids), html)
+        # If the document before this one times out, its worker is killed, which sets this event
+        started.wait()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The worker is stuck on this document, and the requests queued behind it fail with it
+            self.remove(worker)
+            worker.kill()
+            raise TimeoutError(f"Readability.js took longer than {self.timeout} seconds")
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
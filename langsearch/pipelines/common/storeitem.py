@@ -1,12 +1,13 @@
 import datetime
-from difflib import SequenceMatcher
 import logging
 import os
 
 from scrapy.exceptions import DropItem
 
+from langsearch.exceptions import SettingsError
 from langsearch.pipelines.base import BasePipeline
 from langsearch.pipelines.common.mixins.weaviatedb import WeaviateMixin
+from langsearch.utils import simhash, simhash_similarity, text_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,10 @@ class BaseStoreItemPipeline(BasePipeline):
     INPUTS = {
         "text": "text",
         "url": "url",
+        "body_fingerprint": "body_fingerprint",
+        # The text fingerprint and SimHash, for pipelines that compute them without keeping the whole text
+        "text_fingerprint": "text_fingerprint",
+        "text_simhash": "text_simhash"
     }
     CHANGED = "store_item_pipeline_changed"
     CLASS_SCHEMA = {
@@ -34,9 +39,24 @@ class BaseStoreItemPipeline(BasePipeline):
             },
             {
                 "name": "text",
-                "description": "Text of the document, if available",
+                "description": "Text of the document, if available and STORE_TEXT is True",
                 "dataType": ["text"],
             },
+            {
+                "name": "fingerprint",
+                "description": "SHA-256 of the normalized text of the document, if available",
+                "dataType": ["string"],
+            },
+            {
+                "name": "simhash",
+                "description": "SimHash of the normalized text of the document, if available",
+                "dataType": ["string"],
+            },
+            {
+                "name": "body_fingerprint",
+                "description": "SHA-256 of the crawled bytes, if available",
+                "dataType": ["string"],
+            },
             {
                 "name": "last_seen",
                 "description": "When this URL was last seen in the crawling process",
@@ -44,7 +64,17 @@ class BaseStoreItemPipeline(BasePipeline):
             },
         ],
     }
+    # Documents whose text has a different fingerprint are still considered unchanged if the similarity of their
+    # SimHashes is above this percentage. Set USE_SIMHASH to False to only compare fingerprints.
     DUPLICATE_CUTOFF = 95
+    USE_SIMHASH = True
+    # Change detection only needs the fingerprints. Set this to True to store the full text as well.
+    STORE_TEXT = False
+    # Number of items to collect before looking up and writing them in bulk. 1 disables buffering.
+    BUFFER_SIZE = 1
+    # Maximum time in milliseconds that an item waits in the buffer before the buffer is written.
+    BUFFER_TIMEOUT = 1000
+    THREAD_POOL_SIZE = 4
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -53,78 +83,324 @@ class BaseStoreItemPipeline(BasePipeline):
             class_schema = self.get_params_from_file(class_schema)
         self.class_schema = class_schema
         self.class_name = self.class_schema["class"]
-        if not self.weaviate.class_exists(self.class_name):
-            self.weaviate.create_class(self.class_schema)
-        self.duplicate_cutoff = self.__class__.get_setting_from_partial_key(os.environ, "DUPLICATE_CUTOFF")
+        self.weaviate.register_classes([self.class_schema])
+        duplicate_cutoff = self.__class__.get_setting_from_partial_key(os.environ, "DUPLICATE_CUTOFF")
+        if isinstance(duplicate_cutoff, str):
+            try:
+                duplicate_cutoff = float(duplicate_cutoff)
+            except ValueError:
+                raise SettingsError(
+                    f"setting with partial key DUPLICATE_CUTOFF of class {self.__class__} "
+                    f"must be convertible to float, but got '{duplicate_cutoff}'"
+                )
+        self.duplicate_cutoff = duplicate_cutoff
+        use_simhash = self.__class__.get_setting_from_partial_key(os.environ, "USE_SIMHASH")
+        if isinstance(use_simhash, str):
+            use_simhash = use_simhash.lower() in ("1", "true", "yes")
+        self.use_simhash = use_simhash
+        store_text = self.__class__.get_setting_from_partial_key(os.environ, "STORE_TEXT")
+        if isinstance(store_text, str):
+            store_text = store_text.lower() in ("1", "true", "yes")
+        self.store_text = store_text
+        # Properties needed to decide whether a document has changed
+        self.lookup_properties = ["fingerprint", "simhash", "body_fingerprint"]
+        if self.store_text:
+            self.lookup_properties.append("text")
+        buffer_size = self.__class__.get_setting_from_partial_key(os.environ, "BUFFER_SIZE")
+        buffer_timeout = self.__class__.get_setting_from_partial_key(os.environ, "BUFFER_TIMEOUT")
+        for partial_key, value in [("BUFFER_SIZE", buffer_size), ("BUFFER_TIMEOUT", buffer_timeout)]:
+            if isinstance(value, str):
+                try:
+                    int(value)
+                except ValueError:
+                    raise SettingsError(
+                        f"setting with partial key {partial_key} of class {self.__class__} "
+                        f"must be convertible to int, but got '{value}'"
+                    )
+        self.buffer_size = int(buffer_size)
+        self.buffer_timeout = int(buffer_timeout)
+        self.buffer = []
+        self.buffer_flush_call = None
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.weaviate.ensure_registered_classes()
+        self.weaviate.ensure_properties(self.class_name, self.class_schema["properties"])
 
     @staticmethod
-    def similarity(text1, text2):
-        m = SequenceMatcher(None, text1, text2)
-        return m.real_quick_ratio() * 100
+    def similarity(simhash1, simhash2):
+        return simhash_similarity(simhash1, simhash2)
 
-    def get_all_data_obj_for_url(self):
+    def get_all_data_obj_for_url(self, url):
         where_filter = {
             "path": ["url"],
             "operator": "Equal",
-            "valueString": self.url
+            "valueString": url
         }
         result = (
             self.weaviate.client.query
-            .get(self.class_name, ["text"])
+            .get(self.class_name, self.lookup_properties)
             .with_additional(["id"])
             .with_where(where_filter)
             .do()
         )
         return result["data"]["Get"][self.class_name]
 
-    def apply(self, item, spider):
-        if not hasattr(self, "url") or self.url is None:
+    def get_all_data_obj_for_urls(self, urls, properties=None):
+        """
+        Looks up the data objects for all `urls` in one query. Returns a dict mapping each URL to its data objects.
+        """
+        if properties is None:
+            properties = self.lookup_properties
+        where_filter = {
+            "operator": "Or",
+            "operands": [
+                {
+                    "path": ["url"],
+                    "operator": "Equal",
+                    "valueString": url
+                } for url in urls
+            ]
+        }
+        # Twice the number of URLs, so that duplicate data objects show up in the result
+        limit = 2 * len(urls)
+        result = (
+            self.weaviate.client.query
+            .get(self.class_name, ["url", *properties])
+            .with_additional(["id"])
+            .with_where(where_filter)
+            .with_limit(limit)
+            .do()
+        )
+        data_objects = result["data"]["Get"][self.class_name]
+        data = {url: [] for url in urls}
+        for data_object in data_objects:
+            data[data_object["url"]].append(data_object)
+        if len(data_objects) >= limit:
+            # The result may be truncated, so look up the URLs without data objects one by one
+            for url in urls:
+                if len(data[url]) == 0:
+                    data[url] = self.get_all_data_obj_for_url(url)
+        return data
+
+    def get_last_seen(self, urls):
+        """
+        Returns a dict mapping each URL in `urls` to the time it was last seen in the crawling process, or None if the
+        URL is not in the crawl DB. `last_seen` of the crawl DB is the freshness record of a URL. The index pipelines
+        don't rewrite `last_seen` of their data objects when a URL is seen again unchanged, so queries that need
+        freshness should join against this.
+        """
+        data = self.get_all_data_obj_for_urls(urls, properties=("last_seen",))
+        return {url: data[url][0]["last_seen"] if len(data[url]) > 0 else None for url in urls}
+
+    def iter_last_seen(self):
+        """
+        Yields (url, last_seen) tuples for all URLs in the crawl DB, with `last_seen` as a timezone aware datetime, or
+        None if it isn't set. Reads the crawl DB with the cursor API, so it works for crawl DBs of any size.
+        """
+        for data_object in self.weaviate.iter_objects(self.class_name):
+            properties = data_object.get("properties", {})
+            if properties.get("url") is None:
+                continue
+            last_seen = properties.get("last_seen")
+            if last_seen is not None:
+                last_seen = datetime.datetime.fromisoformat(last_seen.replace("Z", "+00:00"))
+            yield properties["url"], last_seen
+
+    def get_urls_not_seen_since(self, timestamp):
+        """
+        Yields the URLs in the crawl DB that were not seen in the crawling process since `timestamp`, a timezone aware
+        datetime. Data objects of these URLs in the index classes are stale and can be garbage collected.
+        """
+        for url, last_seen in self.iter_last_seen():
+            if last_seen is None or last_seen < timestamp:
+                yield url
+
+    def collect_garbage(self, class_names, not_seen_since):
+        """
+        Deletes the URLs that were not seen in the crawling process since `not_seen_since`, a timezone aware datetime,
+        from the crawl DB, and their data objects from the index classes `class_names`, e.g. Section, Summary and
+        Image. Data objects of the index classes whose URL is not in the crawl DB at all are deleted too. Since the
+        index pipelines don't keep `last_seen` of their data objects up to date, freshness is always read from the
+        crawl DB. Returns a dict mapping each class name to the number of URLs whose data objects were deleted.
+        """
+        fresh = set()
+        stale = set()
+        for url, last_seen in self.iter_last_seen():
+            if last_seen is None or last_seen < not_seen_since:
+                stale.add(url)
+            else:
+                fresh.add(url)
+        deleted = {}
+        for class_name in class_names:
+            # Collect the URLs first, since deleting while paging with the cursor could skip data objects
+            urls = {
+                data_object.get("properties", {}).get("url") for data_object in self.weaviate.iter_objects(class_name)
+            }
+            urls = {url for url in urls if url is not None and url not in fresh}
+            for url in urls:
+                self.weaviate.delete_by_url(class_name, url)
+            deleted[class_name] = len(urls)
+        for url in stale:
+            self.weaviate.delete_by_url(self.class_name, url)
+        deleted[self.class_name] = len(stale)
+        return deleted
+
+    def get_data_object(self, url, text, fingerprint, text_simhash, body_fingerprint, now):
+        data_object = {
+            "url": url,
+            "fingerprint": fingerprint,
+            "simhash": text_simhash,
+            "body_fingerprint": body_fingerprint,
+            "last_seen": now
+        }
+        if self.store_text:
+            data_object["text"] = text
+        return data_object
+
+    def is_near_duplicate(self, stored, text_simhash):
+        if text_simhash is None or stored.get("simhash") is None:
+            return False
+        return self.similarity(stored["simhash"], text_simhash) > self.duplicate_cutoff
+
+    def get_simhash(self, text, text_simhash):
+        if not self.use_simhash:
+            return None
+        if text_simhash is None and text is not None:
+            return simhash(text)
+        return text_simhash
+
+    def get_write(self, url, text, body_fingerprint, stored, fingerprint=None, text_simhash=None):
+        """
+        Decides what needs to be written for the item with `url`, `text` and `body_fingerprint`, given the data object
+        `stored` for that URL, or None if there is none. `fingerprint` and `text_simhash` of the text are computed from
+        `text` unless they are given. Returns a tuple (changed, data_object). `data_object` is the complete data
+        object, since writes replace the stored one.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        if fingerprint is None and text is not None:
+            fingerprint = text_fingerprint(text)
+        if stored is None:
+            text_simhash = self.get_simhash(text, text_simhash) if fingerprint is not None else None
+            return True, self.get_data_object(url, text, fingerprint, text_simhash, body_fingerprint, now)
+        if fingerprint is None and body_fingerprint is not None and stored.get("body_fingerprint") != body_fingerprint:
+            # Without text, e.g. for images, the crawled bytes decide whether the item has changed
+            return True, self.get_data_object(url, text, fingerprint, None, body_fingerprint, now)
+        if fingerprint is not None and stored.get("fingerprint") != fingerprint:
+            text_simhash = self.get_simhash(text, text_simhash)
+            if not self.is_near_duplicate(stored, text_simhash):
+                return True, self.get_data_object(url, text, fingerprint, text_simhash, body_fingerprint, now)
+        data_object = {key: value for key, value in stored.items() if key != "_additional"}
+        data_object.update({"url": url, "last_seen": now})
+        if body_fingerprint is not None:
+            # The text is unchanged, but the crawled bytes may not be
+            data_object["body_fingerprint"] = body_fingerprint
+        return False, data_object
+
+    def process_item(self, item, spider):
+        if self.buffer_size <= 1:
+            return super().process_item(item, spider)
+        from twisted.internet import defer, reactor
+
+        if item.get(self.SKIP, False):
+            return item
+        context = self.get_context(item)
+        if context.url is None:
+            return item
+        deferred = defer.Deferred()
+        self.buffer.append((item, self.get_entry(context), deferred))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+        elif self.buffer_flush_call is None:
+            self.buffer_flush_call = reactor.callLater(self.buffer_timeout / 1000, self.flush)
+        return deferred
+
+    def close_spider(self, spider):
+        return self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered items and fires their deferreds. The write runs in the thread pool if there is one.
+        Returns a deferred that fires when the buffered items are written, or None if the buffer is empty.
+        """
+        from twisted.internet import defer, reactor, threads
+
+        if self.buffer_flush_call is not None and self.buffer_flush_call.active():
+            self.buffer_flush_call.cancel()
+        self.buffer_flush_call = None
+        buffer, self.buffer = self.buffer, []
+        if len(buffer) == 0:
+            return
+        entries = [entry for (_item, entry, _deferred) in buffer]
+        if self.thread_pool is None:
+            deferred = defer.maybeDeferred(self.write_buffer, entries)
+        else:
+            deferred = threads.deferToThreadPool(reactor, self.thread_pool, self.write_buffer, entries)
+        deferred.addCallbacks(self.fire_buffer, self.fail_buffer, callbackArgs=(buffer,), errbackArgs=(buffer,))
+        return deferred
+
+    def fire_buffer(self, results, buffer):
+        for (item, _entry, deferred), changed in zip(buffer, results):
+            item[self.CHANGED] = changed
+            deferred.callback(item)
+
+    def fail_buffer(self, failure, buffer):
+        logger.error(
+            f"Error while processing {len(buffer)} buffered items",
+            exc_info=(failure.type, failure.value, failure.getTracebackObject())
+        )
+        for _item, (url, *_values), deferred in buffer:
+            deferred.errback(DropItem(f"Error while processing item with URL {url}"))
+
+    def write_buffer(self, entries):
+        """
+        Looks up the stored data objects for all (url, text, body_fingerprint, text_fingerprint, text_simhash) `entries`
+        in one query and writes them in one batch. Data objects have deterministic uuids, so the batch creates or replaces them without knowing which.
+        Data objects of the URLs stored under other uuids are deleted. Returns a list with the `changed` flag for each
+        entry.
+        """
+        urls = list(dict.fromkeys(url for url, *_values in entries))
+        data = self.get_all_data_obj_for_urls(urls)
+        results = []
+        writes = {}
+        others = []
+        for url, text, body_fingerprint, fingerprint, text_simhash in entries:
+            unique_id = self.weaviate.get_uuid(self.class_name, url)
+            stored = next((d for d in data[url] if d["_additional"]["id"] == unique_id), None)
+            if stored is None and len(data[url]) > 0:
+                stored = data[url][0]
+            others.extend(d["_additional"]["id"] for d in data[url] if d["_additional"]["id"] != unique_id)
+            changed, data_object = self.get_write(url, text, body_fingerprint, stored, fingerprint, text_simhash)
+            writes[url] = (unique_id, data_object)
+            results.append(changed)
+        self.weaviate.upsert(self.class_name, list(writes.values()))
+        for unique_id in set(others):
+            self.weaviate.client.data_object.delete(
+                uuid=unique_id,
+                class_name=self.class_name
+            )
+        return results
+
+    @staticmethod
+    def get_entry(context):
+        # Only some built-in pipelines pass text_fingerprint and text_simhash
+        return (
+            context.url,
+            context.text,
+            context.body_fingerprint,
+            getattr(context, "text_fingerprint", None),
+            getattr(context, "text_simhash", None)
+        )
+
+    def apply(self, item, spider, context):
+        if context.url is None:
             return item
         try:
-            data = self.get_all_data_obj_for_url()
-            count = len(data)
-            if count > 1:
-                message = f"Found {count} data obj for unique property URL {self.url} in class {self.class_name}"
-                logger.warning(message)
-                raise RuntimeError(message)
-            elif count == 0:
-                self.weaviate.client.data_object.create(
-                    class_name=self.class_name,
-                    data_object={
-                        "url": self.url,
-                        "text": self.text if hasattr(self, "text") else None,
-                        "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                    }
-                )
-                item[self.CHANGED] = True
-                return item
-            else:
-                unique_id = data[0]["_additional"]["id"]
-                if hasattr(self, "text"):
-                    text = data[0]["text"]
-                    if self.similarity(text, self.text) <= self.duplicate_cutoff:
-                        self.weaviate.client.data_object.update(
-                            class_name=self.class_name,
-                            uuid=unique_id,
-                            data_object={
-                                "url": self.url,
-                                "text": self.text,
-                                "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                            }
-                        )
-                        item[self.CHANGED] = True
-                        return item
-                self.weaviate.client.data_object.update(
-                    class_name=self.class_name,
-                    uuid=unique_id,
-                    data_object={
-                        "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                    }
-                )
-                item[self.CHANGED] = False
-                return item
+            changed, = self.write_buffer([self.get_entry(context)])
+            item[self.CHANGED] = changed
+            return item
         except:
-            message = f"Error while processing item with URL {self.url}"
+            message = f"Error while processing item with URL {context.url}"
             logger.exception(message)
             raise DropItem(message)
 
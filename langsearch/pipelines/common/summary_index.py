@@ -13,7 +13,8 @@ from scrapy.exceptions import DropItem
 from langsearch.pipelines.common.index import BaseSimpleIndexPipeline
 from langsearch.pipelines.common.mixins.summary import RecursiveReduceSummaryMixin
 from langsearch.pipelines.common.mixins.weaviatedb import WeaviateMixin
-from langsearch.utils import openai_length_function
+from langsearch import tokens
+from langsearch.tokens import count_tokens
 
 
 logger = logging.getLogger(__name__)
@@ -42,6 +43,7 @@ class BaseSummaryIndexPipeline(BaseSimpleIndexPipeline):
         "url": "url",
         "sections": "sections",
         "changed": "changed",
+        # Keyword arguments of summarize(), e.g. from TextSplitterPipeline.get_summarizer_input
         "summarizer_input": "summarizer_input",
     }
     SUMMARY_CLASS_SCHEMA = {
@@ -94,86 +96,61 @@ class BaseSummaryIndexPipeline(BaseSimpleIndexPipeline):
             summary_class_schema = self.get_params_from_file(summary_class_schema)
         self.summary_class_schema = summary_class_schema
         self.summary_class_name = self.summary_class_schema["class"]
-        if not self.weaviate.class_exists(self.summary_class_name):
-            self.weaviate.create_class(self.summary_class_schema)
-
-    def get_all_summaries_for_url(self):
-        where_filter = {
-            "path": ["url"],
-            "operator": "Equal",
-            "valueString": self.url
-        }
-        result = (
-            self.weaviate.client.query
-            .get(self.summary_class_name)
-            .with_additional(["id"])
-            .with_where(where_filter)
-            .do()
-        )
-        return result["data"]["Get"][self.summary_class_name]
+        self.weaviate.register_classes([self.summary_class_schema])
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        tokens.configure(spider.settings)
 
-    def apply(self, item, spider):
-        if not hasattr(self, "url"):
+    def apply(self, item, spider, context):
+        if context.url is None:
             return item
-        if not hasattr(self, "summarizer_input"):
+        if context.summarizer_input is None:
             return item
         try:
-            data = self.get_all_summaries_for_url()
-            count = len(data)
-            if count > 1:
-                message = (
-                        f"Found {count} data obj for unique property URL {self.url}"
-                        f"in class {self.summary_class_name}"
-                )
-                logger.warning(message)
-                raise RuntimeError(message)
-            elif count == 0:
-                self.weaviate.client.data_object.create(
-                    class_name=self.summary_class_name,
-                    data_object={
-                        "url": self.url,
-                        "summary": self.summarize(**self.summarizer_input),
-                        "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                    }
-                )
-            else:
-                if hasattr(self, "changed") and not self.changed:
+            unique_id = self.weaviate.get_uuid(self.summary_class_name, context.url)
+            # An unchanged URL may have no summary yet, e.g. if summarizing it failed in an earlier crawl
+            if context.changed is not None and not context.changed and self.summary_exists(unique_id):
+                if self.update_last_seen:
                     self.weaviate.update_property_with_current_datetime(
                         class_name=self.summary_class_name,
                         where_filter={
                             "path": ["url"],
                             "operator": "Equal",
-                            "valueString": self.url
+                            "valueString": context.url
                         },
                         property_name="last_seen"
                     )
-                else:
-                    unique_id = data[0]["_additional"]["id"]
-                    self.weaviate.client.data_object.delete(
-                        class_name=self.summary_class_name,
-                        uuid=unique_id
-                    )
-                    self.weaviate.client.data_object.create(
-                        class_name=self.summary_class_name,
-                        data_object={
-                            "url": self.url,
-                            "summary": self.summarize(**self.summarizer_input),
-                            "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                        }
-                    )
+            else:
+                self.weaviate.upsert(
+                    self.summary_class_name,
+                    [
+                        (
+                            unique_id,
+                            {
+                                "url": context.url,
+                                "summary": self.summarize(**context.summarizer_input),
+                                "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
+                            }
+                        )
+                    ]
+                )
         except:
-            message = f"Error while storing summary for item with URL {self.url}"
+            message = f"Error while storing summary for item with URL {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
-            super().apply(item, spider)
+            return super().apply(item, spider, context)
+
+    def summary_exists(self, unique_id):
+        return self.weaviate.client.data_object.exists(unique_id, class_name=self.summary_class_name)
 
     @staticmethod
     def extract_links(text):
         return re.findall("(?:http|file)s?://[^\s]+", text)
 
     def get_similar_summaries(self, text, **kwargs):
-        result = self.weaviate.get_similar(self.summary_class_name, text, ["url", "summary", "last_seen"], **kwargs)
+        result = self.weaviate.get_similar(self.summary_class_name, text, ["url", "summary"], **kwargs)
         return [Document(page_content=item["summary"], metadata={"source": item["url"]})
                 for item in result
                 ]
@@ -184,7 +161,7 @@ class BaseSummaryIndexPipeline(BaseSimpleIndexPipeline):
             llm=OpenAIChat(temperature=0, max_tokens=256),
             max_tokens=256,  # This should match the max_tokens of the LLM,
             max_context_size=4096,
-            length_function=openai_length_function,
+            length_function=count_tokens,
             prompt=PROMPT,
             document_variable_name="context",
             document_prompt_template="LINK: {source}\nSUMMARY: {page_content}",
@@ -1,10 +1,9 @@
 import logging
 
-import tiktoken
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
 from langsearch.pipelines.base import BasePipeline
-from langsearch.utils import openai_length_function
+from langsearch.text_splitter import RecursiveTokenTextSplitter
+from langsearch import tokens
+from langsearch.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +14,12 @@ class TextSplitterPipeline(BasePipeline):
         "url": "url"
     }
     SECTIONS = "text_splitter_pipeline_sections"
-    TEXT_SPLITTER_CLASS = RecursiveCharacterTextSplitter
+    # The token count of each section in SECTIONS
+    SECTION_TOKEN_COUNTS = "text_splitter_pipeline_section_token_counts"
+    CPU_BOUND = True
+    TEXT_SPLITTER_CLASS = RecursiveTokenTextSplitter
     TEXT_SPLITTER_CLASS_PARAMS = {
-        "chunk_size": 512,
-        "chunk_overlap": 0,
-        "length_function": openai_length_function
+        "chunk_size": 512
     }
     SIZE_CUTOFF = 40
 
@@ -29,7 +29,10 @@ class TextSplitterPipeline(BasePipeline):
         self.size_cutoff = size_cutoff
 
     @classmethod
-    def from_crawler(cls, crawler):
+    def get_text_splitter_params(cls, crawler):
+        """
+        Returns the text splitter class, its params and the size cutoff from the settings.
+        """
         text_splitter_class = cls.get_setting_from_partial_key(crawler.settings, "TEXT_SPLITTER_CLASS")
         if isinstance(text_splitter_class, str):
             text_splitter_class = cls.get_from_dotted(text_splitter_class)
@@ -37,16 +40,46 @@ class TextSplitterPipeline(BasePipeline):
         if isinstance(text_splitter_class_params, str):
             text_splitter_class_params = cls.get_params_from_file(text_splitter_class_params)
         size_cutoff = cls.get_setting_from_partial_key(crawler.settings, "SIZE_CUTOFF")
-        return cls(text_splitter_class, text_splitter_class_params, size_cutoff)
+        return text_splitter_class, text_splitter_class_params, size_cutoff
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(*cls.get_text_splitter_params(crawler))
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        tokens.configure(spider.settings)
+        # Load the encoding now, instead of while processing the first item
+        tokens.warm_up(getattr(self.text_splitter, "encoding_name", tokens.DEFAULT_ENCODING))
+
+    def split(self, text):
+        """
+        Returns a list of (section, token_count) tuples, including sections below the size cutoff.
+        """
+        if hasattr(self.text_splitter, "split_text_with_counts"):
+            return self.text_splitter.split_text_with_counts(text)
+        # E.g. langchain's text splitters
+        length_function = getattr(self.text_splitter, "_length_function", count_tokens)
+        return [(section, length_function(section)) for section in self.text_splitter.split_text(text)]
+
+    @classmethod
+    def get_summarizer_input(cls, item):
+        """
+        Input for the `summarizer_input` key of SummaryIndexPipeline, which passes the token counts of the sections
+        along, so that they are not counted again.
+        """
+        if cls.SECTIONS not in item:
+            return None
+        return {"sections": item[cls.SECTIONS], "section_lengths": item[cls.SECTION_TOKEN_COUNTS]}
 
-    def apply(self, item, spider):
-        if not hasattr(self, "text") or self.text is None:
+    def apply(self, item, spider, context):
+        if context.text is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
-        # TODO: We calculate the token count twice here. We should probably improve the text splitter so that it outputs
-        # the token count along with the sections.
-        sections = self.text_splitter.split_text(self.text)
-        sections = [section for section in sections if self.text_splitter._length_function(section) > self.size_cutoff]
-        item[self.SECTIONS] = sections
+        sections_with_counts = [
+            (section, count) for section, count in self.split(context.text) if count > self.size_cutoff
+        ]
+        item[self.SECTIONS] = [section for section, _count in sections_with_counts]
+        item[self.SECTION_TOKEN_COUNTS] = [count for _section, count in sections_with_counts]
         return item
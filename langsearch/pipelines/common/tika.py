@@ -1,9 +1,9 @@
 import logging
 
 from scrapy.exceptions import DropItem
-from tika import parser
 
 from langsearch.pipelines.base import BasePipeline
+from langsearch.pipelines.common import tika_client
 
 logger = logging.getLogger(__name__)
 
@@ -14,17 +14,26 @@ class TikaPipeline(BasePipeline):
         "url": "url"
     }
     XML_OUTPUT = "tika_pipeline_xml_output"
+    # Requests to the Tika servers are also bounded by the setting LANGSEARCH_TIKA_MAX_IN_FLIGHT
+    THREAD_POOL_SIZE = 8
 
-    def apply(self, item, spider):
-        if not hasattr(self, "body") or self.body is None:
+    def __init__(self, client, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = client
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(tika_client.get_client(crawler.settings))
+
+    def apply(self, item, spider, context):
+        if context.body is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            # TODO: Add timeout for docker compose like setup.
-            xml_output = parser.from_buffer(self.body, xmlContent=True)["content"]
+            xml_output = self.client.parse_xml(context.body)
         except:
-            message = f"Tika failed to extract text for url {self.url}"
+            message = f"Tika failed to extract text for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
@@ -32,6 +41,6 @@ class TikaPipeline(BasePipeline):
                 item[self.XML_OUTPUT] = xml_output
                 return item
             else:
-                message = f"Tika extraction returned a non-string for url {self.url}"
+                message = f"Tika extraction returned a non-string for url {context.url}"
                 logger.info(message)
                 raise DropItem(message)
@@ -0,0 +1,245 @@
+import atexit
+import itertools
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from langsearch.exceptions import SettingsError
+
+logger = logging.getLogger(__name__)
+
+
+# Comma separated Tika server URLs. Defaults to TIKA_SERVER_ENDPOINT, which tika-python also reads.
+ENDPOINTS_SETTING = "LANGSEARCH_TIKA_ENDPOINTS"
+# Path to a tika-server jar. If set, langsearch launches LANGSEARCH_TIKA_SERVER_COUNT servers itself.
+SERVER_JAR_SETTING = "LANGSEARCH_TIKA_SERVER_JAR"
+SERVER_COUNT_SETTING = "LANGSEARCH_TIKA_SERVER_COUNT"
+# Launched servers listen on consecutive ports starting at this one
+SERVER_PORT_SETTING = "LANGSEARCH_TIKA_SERVER_PORT"
+# Timeout in seconds for one request
+TIMEOUT_SETTING = "LANGSEARCH_TIKA_TIMEOUT"
+# Maximum number of requests in flight across all endpoints
+MAX_IN_FLIGHT_SETTING = "LANGSEARCH_TIKA_MAX_IN_FLIGHT"
+
+DEFAULT_ENDPOINT = "http://localhost:9998"
+DEFAULT_SERVER_COUNT = 2
+DEFAULT_SERVER_PORT = 9998
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_IN_FLIGHT = 8
+# Seconds to wait for a launched server to answer
+STARTUP_TIMEOUT = 120
+# Number of times a request is sent again to a launched server that was restarted
+MAX_RESTARTS = 2
+
+
+class TikaServerPool:
+    """
+    Launches `count` Tika servers from `jar_path` on consecutive ports and restarts the ones that exit.
+    """
+    def __init__(self, jar_path, count, port, java="java"):
+        if not os.path.isfile(jar_path):
+            raise SettingsError(f"Tika server jar {jar_path} does not exist")
+        self.jar_path = jar_path
+        self.java = java
+        self.ports = [port + i for i in range(count)]
+        self.processes = {}
+        self.lock = threading.Lock()
+
+    @property
+    def endpoints(self):
+        return [f"http://127.0.0.1:{port}" for port in self.ports]
+
+    def launch(self, port):
+        logger.info(f"Launching Tika server on port {port}")
+        self.processes[port] = subprocess.Popen(
+            [self.java, "-jar", self.jar_path, "--host", "127.0.0.1", "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def start(self):
+        with self.lock:
+            for port in self.ports:
+                self.launch(port)
+        for port, endpoint in zip(self.ports, self.endpoints):
+            self.wait_until_healthy(port, endpoint)
+
+    def wait_until_healthy(self, port, endpoint):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.processes[port].poll() is not None:
+                raise RuntimeError(f"Tika server on port {port} exited with code {self.processes[port].returncode}")
+            if is_healthy(endpoint):
+                return
+            time.sleep(1)
+        raise RuntimeError(f"Tika server on port {port} did not start within {STARTUP_TIMEOUT} seconds")
+
+    def restart_exited(self, endpoint):
+        """
+        Restarts the server behind `endpoint` if its process has exited. Returns True if it did.
+        """
+        port = self.ports[self.endpoints.index(endpoint)]
+        with self.lock:
+            if self.processes[port].poll() is None:
+                return False
+            logger.warning(f"Tika server on port {port} exited with code {self.processes[port].returncode}")
+            self.launch(port)
+        self.wait_until_healthy(port, endpoint)
+        return True
+
+    def stop(self):
+        with self.lock:
+            processes, self.processes = list(self.processes.values()), {}
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def is_healthy(endpoint):
+    try:
+        return requests.get(f"{endpoint}/version", timeout=5).ok
+    except requests.RequestException:
+        return False
+
+
+class TikaClient:
+    """
+    Talks to one or more Tika servers over keep-alive connections. Requests are spread round-robin over the
+    endpoints, at most `max_in_flight` at a time, and each request times out after `timeout` seconds. A request that
+    can't connect is sent again if the server behind the endpoint was launched by `server_pool` and could be
+    restarted, and is retried on the next endpoint otherwise.
+    """
+    def __init__(self, endpoints, timeout=DEFAULT_TIMEOUT, max_in_flight=DEFAULT_MAX_IN_FLIGHT, server_pool=None):
+        if len(endpoints) == 0:
+            raise SettingsError("at least one Tika endpoint is required")
+        self.endpoints = [endpoint.rstrip("/") for endpoint in endpoints]
+        self.timeout = timeout
+        self.server_pool = server_pool
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.next_endpoints = itertools.cycle(self.endpoints)
+        self.lock = threading.Lock()
+
+    def get_endpoint(self):
+        with self.lock:
+            return next(self.next_endpoints)
+
+    def send(self, path, body, headers, stream=False):
+        endpoint = self.get_endpoint()
+        failed_endpoints = 0
+        restarts = 0
+        while True:
+            try:
+                response = self.session.put(
+                    f"{endpoint}{path}", data=body, headers=headers, timeout=self.timeout, stream=stream
+                )
+            except requests.ConnectionError:
+                if (
+                    self.server_pool is not None
+                    and restarts < MAX_RESTARTS
+                    and self.server_pool.restart_exited(endpoint)
+                ):
+                    # Send it again to the restarted server
+                    restarts += 1
+                    continue
+                failed_endpoints += 1
+                if failed_endpoints == len(self.endpoints):
+                    raise
+                logger.warning(f"Could not connect to Tika server {endpoint}, trying the next one")
+                endpoint = self.get_endpoint()
+                continue
+            response.raise_for_status()
+            return response
+
+    def put(self, path, body, headers):
+        with self.in_flight:
+            return self.send(path, body, headers)
+
+    def parse_xml(self, body):
+        """
+        Returns the XHTML content that Tika extracts from `body`, including the content of embedded documents, or None
+        if Tika extracted no content.
+        """
+        response = self.put("/rmeta/xml", body, {"Accept": "application/json"})
+        # Tika sends null for documents without content
+        contents = [metadata.get("X-TIKA:content") for metadata in response.json()]
+        contents = [content for content in contents if content is not None]
+        if len(contents) == 0:
+            return None
+        return "".join(contents)
+
+    def iter_xhtml(self, body, chunk_size=65536):
+        """
+        Yields the XHTML that Tika extracts from `body` in chunks of bytes, while Tika is still producing it.
+        """
+        with self.in_flight:
+            # text/html would give HTML with unclosed tags, which an XML parser rejects
+            with self.send("/tika", body, {"Accept": "text/xml"}, stream=True) as response:
+                yield from response.iter_content(chunk_size)
+
+    def detect(self, body):
+        """
+        Returns the MIME type that Tika detects for `body`.
+        """
+        response = self.put("/detect/stream", body, {"Accept": "text/plain"})
+        return response.text.strip()
+
+    def close(self):
+        self.session.close()
+        if self.server_pool is not None:
+            self.server_pool.stop()
+
+
+def get_int_setting(settings, key, default):
+    value = settings.get(key)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise SettingsError(f"setting {key} must be convertible to int, but got '{value}'")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(settings):
+    """
+    This function will return the process wide TikaClient for the given settings, launching Tika servers if
+    LANGSEARCH_TIKA_SERVER_JAR is set.
+    :param settings: Scrapy settings or any other dict like object, e.g. os.environ.
+    :return: A TikaClient.
+    """
+    jar_path = settings.get(SERVER_JAR_SETTING)
+    endpoints = settings.get(ENDPOINTS_SETTING) or os.environ.get("TIKA_SERVER_ENDPOINT") or DEFAULT_ENDPOINT
+    if isinstance(endpoints, str):
+        endpoints = [endpoint.strip() for endpoint in endpoints.split(",") if endpoint.strip() != ""]
+    count = get_int_setting(settings, SERVER_COUNT_SETTING, DEFAULT_SERVER_COUNT)
+    port = get_int_setting(settings, SERVER_PORT_SETTING, DEFAULT_SERVER_PORT)
+    timeout = get_int_setting(settings, TIMEOUT_SETTING, DEFAULT_TIMEOUT)
+    max_in_flight = get_int_setting(settings, MAX_IN_FLIGHT_SETTING, DEFAULT_MAX_IN_FLIGHT)
+    key = (jar_path, count, port) if jar_path else tuple(endpoints)
+    with _clients_lock:
+        if key not in _clients:
+            server_pool = None
+            if jar_path:
+                server_pool = TikaServerPool(jar_path, count, port)
+                server_pool.start()
+                endpoints = server_pool.endpoints
+            client = TikaClient(endpoints, timeout, max_in_flight, server_pool)
+            atexit.register(client.close)
+            _clients[key] = client
+        return _clients[key]
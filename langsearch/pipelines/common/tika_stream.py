@@ -0,0 +1,139 @@
+import logging
+
+from inscriptis import ParserConfig
+from inscriptis.html_engine import Inscriptis
+from lxml import etree
+from scrapy.exceptions import DropItem
+
+from langsearch.exceptions import SettingsError
+from langsearch.pipelines.common import tika_client
+from langsearch.pipelines.common.inscriptis import InscriptisPipeline
+from langsearch.pipelines.common.textsplitter import TextSplitterPipeline
+from langsearch.utils import TextDigest
+
+logger = logging.getLogger(__name__)
+
+
+class TikaStreamingPipeline(TextSplitterPipeline):
+    """
+    Extracts text with Tika and splits it into sections page by page, while Tika is still streaming the XHTML. Each
+    child of <body>, i.e. each <div class="page"> for PDFs, is converted to text with Inscriptis and freed before the
+    next one is parsed, so the XHTML of the whole document is never held in memory. The end of the text split so far is
+    carried over to the next page, so that sections can span page boundaries.
+    The text itself is not kept: the fingerprint and the SimHash that the StoreItemPipeline compares are computed page
+    by page, and only the first MAX_TEXT_LENGTH characters are kept under EXTRACTED_TEXT.
+    The text splitter settings have the same partial keys as TextSplitterPipeline's, e.g. TEXT_SPLITTER_CLASS.
+    """
+    INPUTS = {
+        "body": "body",
+        "url": "url"
+    }
+    # The start of the text, at most MAX_TEXT_LENGTH characters
+    EXTRACTED_TEXT = "tika_streaming_pipeline_extracted_text"
+    TEXT_FINGERPRINT = "tika_streaming_pipeline_text_fingerprint"
+    TEXT_SIMHASH = "tika_streaming_pipeline_text_simhash"
+    SECTIONS = "tika_streaming_pipeline_sections"
+    SECTION_TOKEN_COUNTS = "tika_streaming_pipeline_section_token_counts"
+    CPU_BOUND = False
+    # Requests to the Tika servers are also bounded by the setting LANGSEARCH_TIKA_MAX_IN_FLIGHT
+    THREAD_POOL_SIZE = 8
+    PARSER_CONFIG = InscriptisPipeline.PARSER_CONFIG
+    # Number of bytes of XHTML read from Tika at a time
+    CHUNK_SIZE = 65536
+    MAX_TEXT_LENGTH = 100000
+
+    def __init__(self, client, parser_config, max_text_length, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = client
+        self.parser_config = parser_config
+        self.max_text_length = max_text_length
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        parser_config = cls.get_setting_from_partial_key(crawler.settings, "PARSER_CONFIG")
+        if not isinstance(parser_config, ParserConfig):
+            raise SettingsError(
+                f"setting with partial key PARSER_CONFIG of class {cls} must be a inscriptis.ParserConfig, "
+                f"got {type(parser_config)}"
+            )
+        max_text_length = cls.get_setting_from_partial_key(crawler.settings, "MAX_TEXT_LENGTH")
+        try:
+            max_text_length = int(max_text_length)
+        except ValueError:
+            raise SettingsError(
+                f"setting with partial key MAX_TEXT_LENGTH of class {cls} must be convertible to int, "
+                f"but got '{max_text_length}'"
+            )
+        client = tika_client.get_client(crawler.settings)
+        return cls(client, parser_config, max_text_length, *cls.get_text_splitter_params(crawler))
+
+    def get_text(self, element):
+        # Inscriptis expects HTML tag names without the XHTML namespace
+        for child in element.iter():
+            if isinstance(child.tag, str) and child.tag.startswith("{"):
+                child.tag = etree.QName(child).localname
+        text = Inscriptis(element, self.parser_config).get_text()
+        if element.tail is not None and not element.tail.isspace():
+            text = f"{text}\n{element.tail}"
+        return text
+
+    def iter_pages(self, body):
+        """
+        Yields the text of each child of the XHTML <body> that Tika extracts from `body`.
+        """
+        parser = etree.XMLPullParser(events=("start", "end"), huge_tree=True)
+        body_element = None
+        for chunk in self.client.iter_xhtml(body, self.CHUNK_SIZE):
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if body_element is None and etree.QName(element).localname == "body":
+                        body_element = element
+                    continue
+                if body_element is None or element.getparent() is not body_element:
+                    continue
+                yield self.get_text(element)
+                # Free the page and everything before it
+                element.clear(keep_tail=False)
+                while element.getprevious() is not None:
+                    del body_element[0]
+        parser.close()
+
+    def apply(self, item, spider, context):
+        if context.body is None:
+            return item
+        if context.url is None:
+            return item
+        digest = TextDigest()
+        text_start = []
+        text_start_length = 0
+        sections_with_counts = []
+        # The last section split so far, which may continue on the next page
+        tail = ""
+        try:
+            for text in self.iter_pages(context.body):
+                if text.strip() == "":
+                    continue
+                digest.update(text)
+                if text_start_length < self.max_text_length:
+                    text_start.append(text[:self.max_text_length - text_start_length])
+                    text_start_length += len(text) + 2
+                split = self.split(text if tail == "" else f"{tail}\n\n{text}")
+                if len(split) == 0:
+                    tail = ""
+                    continue
+                sections_with_counts.extend(split[:-1])
+                tail = split[-1][0]
+            if tail != "":
+                sections_with_counts.extend(self.split(tail))
+        except:
+            message = f"Tika failed to extract text for url {context.url}"
+            logger.exception(message)
+            raise DropItem(message)
+        sections_with_counts = [(section, count) for section, count in sections_with_counts if count > self.size_cutoff]
+        item[self.EXTRACTED_TEXT] = "\n\n".join(text_start)[:self.max_text_length]
+        item[self.TEXT_FINGERPRINT] = digest.fingerprint()
+        item[self.TEXT_SIMHASH] = digest.simhash()
+        item[self.SECTIONS] = [section for section, _count in sections_with_counts]
+        item[self.SECTION_TOKEN_COUNTS] = [count for _section, count in sections_with_counts]
+        return item
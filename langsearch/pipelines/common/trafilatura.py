@@ -15,6 +15,7 @@ class TrafilaturaPipeline(BasePipeline):
         "url": "url"
     }
     TEXT_WITHOUT_BP = "trafilatura_pipeline_text_without_bp"
+    CPU_BOUND = True
     EXTRACT_ARGUMENTS = {}
 
     def __init__(self, trafilatura_extract_arguments, *args, **kwargs):
@@ -31,16 +32,16 @@ class TrafilaturaPipeline(BasePipeline):
             )
         return cls(trafilatura_extract_arguments)
 
-    def apply(self, item, spider):
-        if not hasattr(self, "html") or self.html is None:
+    def apply(self, item, spider, context):
+        if context.html is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         args = {**self.trafilatura_extract_arguments, "output_format": "text"}
         try:
-            text_without_bp = extract(self.html, **args)
+            text_without_bp = extract(context.html, **args)
         except:
-            message = f"Trafilatura failed to extract text for url {self.url}"
+            message = f"Trafilatura failed to extract text for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
@@ -48,6 +49,6 @@ class TrafilaturaPipeline(BasePipeline):
                 item[self.TEXT_WITHOUT_BP] = text_without_bp
                 return item
             else:
-                message = f"Trafilatura extraction returned a non-string for url {self.url}"
+                message = f"Trafilatura extraction returned a non-string for url {context.url}"
                 logger.warning(message)
                 raise DropItem(message)
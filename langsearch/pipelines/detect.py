@@ -1,26 +1,167 @@
 import logging
+import mimetypes
+import os
+import threading
+from urllib.parse import unquote, urlparse
 
-from scrapy.exceptions import DropItem
-from tika import detector
-
+from langsearch.exceptions import SettingsError
+from langsearch.pipelines.base import BasePipeline
+from langsearch.pipelines.common import tika_client
 from langsearch.pipelines.types.enumerations import ItemType
 
 logger = logging.getLogger(__name__)
 
 
-class DetectItemTypePipeline:
-    def process_item(self, item, spider):
-        response = item["response"]
+# (offset, magic bytes, MIME type). Checked in order, so longer signatures come before shorter ones.
+MAGIC_NUMBERS = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"\xff\xf3", "audio/mpeg"),
+    (0, b"\xff\xf2", "audio/mpeg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (8, b"WAVE", "audio/wav"),
+    (8, b"AVI ", "video/x-msvideo"),
+    (8, b"WEBP", "image/webp"),
+    (4, b"ftypM4A", "audio/mp4"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"{\\rtf", "application/rtf"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-tika-msoffice"),
+]
+# Formats that contain other formats, e.g. DOCX and ODT files are ZIP files. The extension or the headers tell more.
+CONTAINER_MIME_TYPES = {"application/zip", "application/x-tika-msoffice"}
+# Content-Type values that say nothing about the content
+GENERIC_CONTENT_TYPES = {"", "application/octet-stream", "binary/octet-stream", "application/unknown"}
+HTML_PREFIXES = (b"<!doctype html", b"<html")
+# Extensions that are missing from the mimetypes module on some systems
+EXTENSIONS = {
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".odt": "application/vnd.oasis.opendocument.text",
+    ".ods": "application/vnd.oasis.opendocument.spreadsheet",
+    ".odp": "application/vnd.oasis.opendocument.presentation",
+    ".epub": "application/epub+zip",
+    ".md": "text/markdown",
+}
+
+
+def detect_from_magic(prefix):
+    """
+    Returns the MIME type of the data starting with `prefix`, or None if no known signature matches.
+    """
+    for offset, magic, mime_type in MAGIC_NUMBERS:
+        if prefix.startswith(magic, offset):
+            if offset == 8 and not prefix.startswith(b"RIFF"):
+                continue
+            return mime_type
+    if prefix.lstrip(b"\xef\xbb\xbf \t\r\n")[:20].lower().startswith(HTML_PREFIXES):
+        return "text/html"
+    return None
+
+
+def get_file_extension(url):
+    """
+    Returns the lower case extension of a file:// URL, or an empty string for other URLs.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != "file":
+        return ""
+    return os.path.splitext(unquote(parsed.path))[1].lower()
+
+
+def get_content_type(response):
+    try:
+        content_type = response.headers["Content-Type"]
+    except KeyError:
+        return ""
+    if content_type is None:
+        return ""
+    if isinstance(content_type, bytes):
+        content_type = content_type.decode("latin-1")
+    return content_type.split(";")[0].strip().lower()
+
+
+class DetectItemTypePipeline(BasePipeline):
+    """
+    Sets the ItemType and the MIME type of each item. The MIME type is detected locally from the magic bytes at the
+    start of the body, then from the extension of file:// URLs, then from the Content-Type header. Only when these are
+    ambiguous, a prefix of the body is sent to Tika. Results that don't depend on the magic bytes are cached by
+    extension and Content-Type.
+    """
+    THREAD_POOL_SIZE = 4
+    MIME_TYPE = "mime_type"
+    # Number of bytes checked for magic bytes
+    MAGIC_PREFIX_SIZE = 8192
+    # Number of bytes sent to Tika when local detection is ambiguous
+    TIKA_PREFIX_SIZE = 1048576
+
+    def __init__(self, tika_prefix_size, settings=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tika_prefix_size = tika_prefix_size
+        # The Tika client is only created when it is needed, so that crawls that are detected locally don't need Tika
+        self.settings = os.environ if settings is None else settings
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        tika_prefix_size = cls.get_setting_from_partial_key(crawler.settings, "TIKA_PREFIX_SIZE")
         try:
-            content_type = response.headers["Content-Type"]
-            if isinstance(content_type, bytes):
-                content_type = content_type.decode()
-            if content_type.startswith("text/html"):
-                item["type"] = ItemType.HTML
-                return item
-        except KeyError:
-            pass
-        mime_type = detector.from_buffer(response.body)
+            tika_prefix_size = int(tika_prefix_size)
+        except ValueError:
+            raise SettingsError(
+                f"setting with partial key TIKA_PREFIX_SIZE of class {cls} must be convertible to int, "
+                f"but got '{tika_prefix_size}'"
+            )
+        return cls(tika_prefix_size, crawler.settings)
+
+    def detect(self, response):
+        prefix = response.body[:self.MAGIC_PREFIX_SIZE]
+        mime_type = detect_from_magic(prefix)
+        if mime_type is not None and mime_type not in CONTAINER_MIME_TYPES:
+            return mime_type
+        extension = get_file_extension(response.url)
+        content_type = get_content_type(response)
+        key = (extension, content_type)
+        with self.cache_lock:
+            cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if extension != "":
+            guessed = EXTENSIONS.get(extension) or mimetypes.guess_type(f"file{extension}")[0]
+            if guessed is not None:
+                with self.cache_lock:
+                    self.cache[key] = guessed
+                return guessed
+        if content_type not in GENERIC_CONTENT_TYPES:
+            with self.cache_lock:
+                self.cache[key] = content_type
+            return content_type
+        if mime_type is not None:
+            # A container without a telling extension or header
+            return mime_type
+        mime_type = tika_client.get_client(self.settings).detect(response.body[:self.tika_prefix_size])
+        if extension != "":
+            with self.cache_lock:
+                self.cache[key] = mime_type
+        return mime_type
+
+    def apply(self, item, spider, context):
+        response = item["response"]
+        mime_type = self.detect(response)
+        item[self.MIME_TYPE] = mime_type
         if mime_type == "text/html":
             item["type"] = ItemType.HTML
             return item
@@ -36,6 +177,3 @@ class DetectItemTypePipeline:
         else:
             item["type"] = ItemType.OTHER
             return item
-        message = f"Item with url {response.url} could not be classified into a type"
-        logger.warning(message)
-        raise DropItem(message)
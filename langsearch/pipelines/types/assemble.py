@@ -1,7 +1,59 @@
 import graphlib
 
+from langsearch.pipelines.chain import ExtractionChainPipeline
 
-def assemble(*built_in_pipelines):
+
+def get_routes(built_in_pipeline):
+    """
+    Returns the keys that `built_in_pipeline` adds to INPUTS: its ItemType, or (ItemType, MIME type) for each of its
+    MIME_TYPES.
+    """
+    mime_types = getattr(built_in_pipeline, "MIME_TYPES", None)
+    if not mime_types:
+        return [built_in_pipeline.ITEM_TYPE]
+    return [(built_in_pipeline.ITEM_TYPE, mime_type) for mime_type in mime_types]
+
+
+def collapse_cpu_bound(built_in_pipelines, graph, pipeline_inputs):
+    """
+    Replaces the CPU-bound pipelines in `graph` by a subclass of ExtractionChainPipeline, which runs them in worker
+    processes. Returns the new graph, or `graph` itself if there are no CPU-bound pipelines.
+    """
+    cpu_bound = {pipeline for pipeline in graph if getattr(pipeline, "CPU_BOUND", False)}
+    if len(cpu_bound) == 0:
+        return graph
+    stages = {}
+    for built_in_pipeline in built_in_pipelines:
+        sorted_pipelines = [
+            pipeline for (pipeline, priority) in sorted(built_in_pipeline.ITEM_PIPELINES.items(), key=lambda x: x[1])
+        ]
+        for route in get_routes(built_in_pipeline):
+            stages[route] = [pipeline for pipeline in sorted_pipelines if pipeline in cpu_bound]
+    read_by_stages = set()
+    read_by_others = set()
+    for pipeline, inputs in pipeline_inputs.items():
+        keys = read_by_stages if pipeline in cpu_bound else read_by_others
+        for item_type_and_key in inputs.values():
+            keys.update(key for key in item_type_and_key.values() if isinstance(key, str))
+    chain = type(
+        "ExtractionChainPipeline",
+        (ExtractionChainPipeline,),
+        {"STAGES": stages, "DROP_KEYS": frozenset(read_by_stages - read_by_others)}
+    )
+    for pipeline in cpu_bound:
+        pipeline.INPUTS = pipeline_inputs[pipeline]
+    pipeline_inputs[chain] = {}
+    collapsed = {}
+    for pipeline, predecessors in graph.items():
+        node = chain if pipeline in cpu_bound else pipeline
+        collapsed.setdefault(node, set()).update(
+            chain if predecessor in cpu_bound else predecessor for predecessor in predecessors
+        )
+        collapsed[node].discard(node)
+    return collapsed
+
+
+def assemble(*built_in_pipelines, process_pool=False):
     """
     These two dicts are constructed
 
@@ -34,9 +86,18 @@ def assemble(*built_in_pipelines):
     All ItemTypes will pass through all pipelines in the list
     However, if the pipeline_inputs doesn't define a particular ItemType for a pipeline required input,
     then the pipeline won't do anything for that ItemType
+
+    A built-in pipeline with MIME_TYPES only handles items of its ItemType with one of these MIME types, e.g.
+    GenericDocumentPipeline handles PDFs and office documents of ItemType.OTHER. Its inputs are keyed by
+    (ItemType, MIME type) instead of ItemType, and these keys are set as ROUTES on all pipelines. The other items of
+    the same ItemType are handled by the built-in pipeline without MIME_TYPES, if there is one.
+
+    If `process_pool` is True, the CPU-bound pipelines are collapsed into one ExtractionChainPipeline before sorting.
+    It runs the CPU-bound pipelines of each ItemType in order in a pool of worker processes.
     """
     graph = {}
     pipeline_inputs = {}
+    routes = set()
     for built_in_pipeline in built_in_pipelines:
         sorted_pipelines = [pipeline for (pipeline, priority) in
                             sorted(built_in_pipeline.ITEM_PIPELINES.items(), key=lambda x: x[1])
@@ -51,14 +112,22 @@ def assemble(*built_in_pipelines):
                     graph[pipeline].update(predecessors)
                 except KeyError:
                     graph[pipeline] = set(predecessors)
-            for key, value in built_in_pipeline.PIPELINE_INPUTS[pipeline].items():
-                try:
-                    pipeline_inputs[pipeline][key][built_in_pipeline.ITEM_TYPE] = value
-                except KeyError:
+            for route in get_routes(built_in_pipeline):
+                if isinstance(route, tuple):
+                    routes.add(route)
+                for key, value in built_in_pipeline.PIPELINE_INPUTS[pipeline].items():
                     try:
-                        pipeline_inputs[pipeline][key] = {built_in_pipeline.ITEM_TYPE: value}
+                        pipeline_inputs[pipeline][key][route] = value
                     except KeyError:
-                        pipeline_inputs[pipeline] = {key: {built_in_pipeline.ITEM_TYPE: value}}
+                        try:
+                            pipeline_inputs[pipeline][key] = {route: value}
+                        except KeyError:
+                            pipeline_inputs[pipeline] = {key: {route: value}}
+    routes = frozenset(routes)
+    for pipeline in pipeline_inputs:
+        pipeline.ROUTES = routes
+    if process_pool:
+        graph = collapse_cpu_bound(built_in_pipelines, graph, pipeline_inputs)
     ts = graphlib.TopologicalSorter(graph)
     try:
         final_order = list(ts.static_order())
@@ -68,6 +137,7 @@ def assemble(*built_in_pipelines):
     final_pipeline = {}
     for pipeline in final_order:
         pipeline.INPUTS = pipeline_inputs[pipeline]
+        pipeline.ROUTES = routes
         final_pipeline[pipeline] = start
         start += 1
         # Langsearch's pipelines use a priority space of 400 - 600. If we exceed that, we throw an error.
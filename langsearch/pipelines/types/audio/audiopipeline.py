@@ -1,3 +1,5 @@
+from langsearch.pipelines.base import response_attribute
+from langsearch.pipelines.common.fingerprint import FingerprintPipeline
 from langsearch.pipelines.common.index import SimpleIndexPipeline
 from langsearch.pipelines.common.storeitem import StoreItemPipeline
 from langsearch.pipelines.common.textsplitter import TextSplitterPipeline
@@ -12,34 +14,42 @@ class GenericAudioPipeline:
     ITEM_TYPE = ItemType.AUDIO
 
     ITEM_PIPELINES = {
-        WhisperPipeline: 400,
-        TextSplitterPipeline: 410,
-        StoreItemPipeline: 420,
-        SimpleIndexPipeline: 430
+        FingerprintPipeline: 400,
+        WhisperPipeline: 410,
+        TextSplitterPipeline: 420,
+        StoreItemPipeline: 430,
+        SimpleIndexPipeline: 440
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     WHISPER_PIPELINE_INPUTS = {
-        "body": lambda item: getattr(item["response"], "body"),
-        "url": lambda item: getattr(item["response"], "url")
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     TEXT_SPLITTER_PIPELINE_INPUTS = {
         "text": WhisperPipeline.TRANSCRIPTION,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url")
     }
 
     STORE_ITEM_PIPELINE_INPUTS = {
         "text": WhisperPipeline.TRANSCRIPTION,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT
     }
 
     SIMPLE_INDEX_PIPELINE_INPUTS = {
         "sections": TextSplitterPipeline.SECTIONS,
-        "url": lambda item: getattr(item["response"], "url"),
+        "url": response_attribute("url"),
         "changed": StoreItemPipeline.CHANGED
     }
 
     PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
         WhisperPipeline: WHISPER_PIPELINE_INPUTS,
         TextSplitterPipeline: TEXT_SPLITTER_PIPELINE_INPUTS,
         StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
@@ -1,5 +1,6 @@
 from io import StringIO
 import logging
+import threading
 
 import ffmpeg
 import numpy as np
@@ -32,6 +33,18 @@ class WhisperPipeline(BasePipeline):
         self.transcription_options = transcription_options
         self.allowed_languages = allowed_languages
         self.writer = get_writer(output_format, output_dir="")  # We don't use the output dir
+        # Each thread keeps one 30 second window for language detection, instead of allocating one per item
+        self.local = threading.local()
+
+    def __getstate__(self):
+        # Thread-locals can't be pickled, e.g. to run with a time budget. The worker process allocates its own windows.
+        state = super().__getstate__()
+        state.pop("local", None)
+        return state
+
+    def __setstate__(self, state):
+        self.local = threading.local()
+        super().__setstate__(state)
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -62,41 +75,59 @@ class WhisperPipeline(BasePipeline):
             )
         return cls(model, transcription_options, allowed_languages, output_format)
 
-    def load_audio(self):
+    def load_audio(self, body):
         try:
             out, _ = (
                 ffmpeg.input("pipe:", threads=0)
                 .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=16000)  # sample rate is hardcoded in whisper
-                .run(cmd="ffmpeg", capture_stdout=True, capture_stderr=True, input=self.body)
+                .run(cmd="ffmpeg", capture_stdout=True, capture_stderr=True, input=body)
             )
         except ffmpeg.Error as e:
             raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
 
-        return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+        # One float32 copy of the samples, scaled in place
+        audio = np.frombuffer(out, np.int16).astype(np.float32)
+        audio *= 1 / 32768.0
+        return audio
+
+    def get_window(self, audio):
+        """
+        Returns the first 30 seconds of `audio`, padded with silence, in this thread's preallocated buffer. Like
+        whisper.pad_or_trim, but without allocating a new array.
+        """
+        window = getattr(self.local, "window", None)
+        if window is None:
+            window = np.zeros(whisper.audio.N_SAMPLES, dtype=np.float32)
+            self.local.window = window
+        length = min(len(audio), len(window))
+        window[:length] = audio[:length]
+        window[length:] = 0
+        return window
 
-    def apply(self, item, spider):
-        if not hasattr(self, "body") or self.body is None:
+    def apply(self, item, spider, context):
+        if context.body is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            audio = self.load_audio()
-            audio_for_lang_detection = whisper.pad_or_trim(audio)
-            mel = whisper.log_mel_spectrogram(audio_for_lang_detection).to(self.model.device)
-            # TODO: We are doing language detection twice, once here and once in transcribe(). Make this more optimal.
+            audio = self.load_audio(context.body)
+            mel = whisper.log_mel_spectrogram(self.get_window(audio)).to(self.model.device)
             _, probs = self.model.detect_language(mel)
             detected_lang = max(probs, key=probs.get)
             if detected_lang not in self.allowed_languages:
-                logger.info(f"Detected language {detected_lang} of audio at URL {self.url} "
+                logger.info(f"Detected language {detected_lang} of audio at URL {context.url} "
                             f"is not in allowed languages {self.allowed_languages}"
                             )
                 return item
-            result = whisper.transcribe(self.model, audio, **self.transcription_options)
+            # Passing the language stops transcribe() from detecting it again
+            transcription_options = dict(self.transcription_options)
+            transcription_options.setdefault("language", detected_lang)
+            result = whisper.transcribe(self.model, audio, **transcription_options)
             text_stream = StringIO()
             self.writer.write_result(result, file=text_stream)
             item[self.TRANSCRIPTION] = text_stream.getvalue()
             return item
         except:
-            message = f"Whisper failed to extract text for url {self.url}"
+            message = f"Whisper failed to extract text for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
@@ -1,6 +1,7 @@
 import logging
 
 from lxml import etree
+import lxml.html
 from scrapy.exceptions import DropItem
 
 from langsearch.pipelines.base import BasePipeline
@@ -13,18 +14,38 @@ class FixHTMLPipeline(BasePipeline):
         "html": "html",
         "url": "url"
     }
+    # The parsed lxml.html tree, which the following pipelines use instead of parsing the HTML again
+    PARSED_HTML = "fix_html_pipeline_parsed_html"
     FIXED_HTML = "fix_html_pipeline_html"
+    CPU_BOUND = True
+    # If True, the parsed tree is also serialized to FIXED_HTML for pipelines that need a string. Set it to False if
+    # all following pipelines read PARSED_HTML, like the ones of GenericHTMLPipeline, to save the serialization.
+    SERIALIZE = True
 
-    def apply(self, item, spider):
-        if not hasattr(self, "html") or self.html is None:
+    def __init__(self, serialize, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.serialize = serialize
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        serialize = cls.get_setting_from_partial_key(crawler.settings, "SERIALIZE")
+        if isinstance(serialize, str):
+            serialize = serialize.lower() in ("1", "true", "yes")
+        return cls(serialize)
+
+    def apply(self, item, spider, context):
+        if context.html is None:
             return item
         try:
-            parsed = etree.HTML(self.html)
+            parsed = etree.HTML(context.html, parser=lxml.html.html_parser)
+            if parsed is None:
+                raise ValueError("Document is empty")
         except:
-            message = f"Failed to parse response html for url {self.url}"
+            message = f"Failed to parse response html for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
         else:
-            item[self.FIXED_HTML] = etree.tostring(parsed, method="html", encoding=str)
+            item[self.PARSED_HTML] = parsed
+            if self.serialize:
+                item[self.FIXED_HTML] = etree.tostring(parsed, method="html", encoding=str)
             return item
-
@@ -1,3 +1,5 @@
+from langsearch.pipelines.base import response_attribute
+from langsearch.pipelines.common.fingerprint import FingerprintPipeline
 from langsearch.pipelines.common.index import SimpleIndexPipeline
 from langsearch.pipelines.common.storeitem import StoreItemPipeline
 from langsearch.pipelines.common.textsplitter import TextSplitterPipeline
@@ -5,6 +7,7 @@ from langsearch.pipelines.common.python_readability import PythonReadabilityPipe
 from langsearch.pipelines.common.inscriptis import InscriptisPipeline
 from langsearch.pipelines.types.enumerations import ItemType
 from langsearch.pipelines.types.html.fix_html import FixHTMLPipeline
+from langsearch.pipelines.types.html.router import ExtractionRouterPipeline
 
 
 class GenericHTMLPipeline:
@@ -14,46 +17,66 @@ class GenericHTMLPipeline:
     ITEM_TYPE = ItemType.HTML
 
     ITEM_PIPELINES = {
-        FixHTMLPipeline: 400,
-        PythonReadabilityPipeline: 410,
-        InscriptisPipeline: 420,
-        TextSplitterPipeline: 430,
-        StoreItemPipeline: 440,
-        SimpleIndexPipeline: 450
+        FingerprintPipeline: 400,
+        ExtractionRouterPipeline: 405,
+        FixHTMLPipeline: 410,
+        PythonReadabilityPipeline: 420,
+        InscriptisPipeline: 430,
+        TextSplitterPipeline: 440,
+        StoreItemPipeline: 450,
+        SimpleIndexPipeline: 460
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
+    }
+
+    EXTRACTION_ROUTER_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     FIX_HTML_PIPELINE_INPUTS = {
-        "html": lambda item: getattr(item["response"], "text"),
-        "url": lambda item: getattr(item["response"], "url")
+        "html": response_attribute("text"),
+        "url": response_attribute("url")
     }
 
     PYTHON_READABILITY_PIPELINE_INPUTS = {
-        "html": FixHTMLPipeline.FIXED_HTML,
-        "url": lambda item: getattr(item["response"], "url")
+        "html": ExtractionRouterPipeline.get_input({
+            ExtractionRouterPipeline.READABILITY: FixHTMLPipeline.PARSED_HTML
+        }),
+        "url": response_attribute("url")
     }
 
     INSCRIPTIS_PIPELINE_INPUTS = {
-        "html": PythonReadabilityPipeline.HTML_WITHOUT_BP,
-        "url": lambda item: getattr(item["response"], "url")
+        "html": ExtractionRouterPipeline.get_input({
+            ExtractionRouterPipeline.READABILITY: PythonReadabilityPipeline.PARSED_HTML_WITHOUT_BP,
+            ExtractionRouterPipeline.DIRECT: FixHTMLPipeline.PARSED_HTML
+        }),
+        "url": response_attribute("url")
     }
 
     TEXT_SPLITTER_PIPELINE_INPUTS = {
         "text": InscriptisPipeline.EXTRACTED_TEXT,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url")
     }
 
     STORE_ITEM_PIPELINE_INPUTS = {
         "text": InscriptisPipeline.EXTRACTED_TEXT,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT
     }
 
     SIMPLE_INDEX_PIPELINE_INPUTS = {
         "sections": TextSplitterPipeline.SECTIONS,
-        "url": lambda item: getattr(item["response"], "url"),
+        "url": response_attribute("url"),
         "changed": StoreItemPipeline.CHANGED
     }
 
     PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
+        ExtractionRouterPipeline: EXTRACTION_ROUTER_PIPELINE_INPUTS,
         FixHTMLPipeline: FIX_HTML_PIPELINE_INPUTS,
         PythonReadabilityPipeline: PYTHON_READABILITY_PIPELINE_INPUTS,
         InscriptisPipeline: INSCRIPTIS_PIPELINE_INPUTS,
@@ -0,0 +1,95 @@
+import functools
+import logging
+import re
+
+from langsearch.exceptions import SettingsError
+from langsearch.pipelines.base import BasePipeline
+
+logger = logging.getLogger(__name__)
+
+
+TAG = re.compile(rb"<[^>]*>")
+# Elements whose content is not text of the page, e.g. JavaScript, CSS and JSON payloads
+INVISIBLE = re.compile(rb"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+START_TAG = re.compile(rb"<[A-Za-z]")
+
+
+class ExtractionRouterPipeline(BasePipeline):
+    """
+    Chooses how the text of an HTML page is extracted, from signals that are cheap to compute on the raw bytes.
+    Ordinary pages go through readability. Pages above MAX_BYTES or MAX_NODES, where readability's scoring takes
+    seconds, and pages that are almost all text (text to total ratio above MAX_TEXT_RATIO, e.g. log dumps), where
+    there is no boilerplate to remove, skip readability and go straight to the linear time text extraction. The content
+    of script, style, noscript and template elements doesn't count as text.
+
+    The route is stored in the item under ROUTE and counted in the Scrapy stats. Following pipelines choose their input
+    keys by route with `get_input`.
+    """
+    INPUTS = {
+        "body": "body",
+        "url": "url"
+    }
+    ROUTE = "extraction_router_pipeline_route"
+    READABILITY = "readability"
+    DIRECT = "direct"
+    MAX_BYTES = 2000000
+    MAX_NODES = 50000
+    MAX_TEXT_RATIO = 0.9
+
+    def __init__(self, max_bytes, max_nodes, max_text_ratio, stats, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self.max_nodes = max_nodes
+        self.max_text_ratio = max_text_ratio
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        params = {}
+        for name, convert in (("MAX_BYTES", int), ("MAX_NODES", int), ("MAX_TEXT_RATIO", float)):
+            value = cls.get_setting_from_partial_key(crawler.settings, name)
+            try:
+                params[name.lower()] = convert(value)
+            except ValueError:
+                raise SettingsError(
+                    f"setting with partial key {name} of class {cls} must be convertible to {convert.__name__}, "
+                    f"but got '{value}'"
+                )
+        return cls(stats=crawler.stats, **params)
+
+    @classmethod
+    def get_input(cls, keys):
+        """
+        Returns a callable for INPUTS that gives the value of the item key that `keys` maps the route of the item to.
+        Items without a route take the READABILITY route. If the route is not in `keys`, the input is None.
+        """
+        # A partial, unlike a closure, can be pickled for the worker processes
+        return functools.partial(cls.get_routed_input, keys)
+
+    @classmethod
+    def get_routed_input(cls, keys, item):
+        return item[keys[item.get(cls.ROUTE, cls.READABILITY)]]
+
+    def choose_route(self, body):
+        """
+        Returns the route and the reason for it.
+        """
+        if len(body) > self.max_bytes:
+            return self.DIRECT, "bytes"
+        if len(START_TAG.findall(body)) > self.max_nodes:
+            return self.DIRECT, "nodes"
+        # Regular expressions on the raw bytes are fast enough to run on the reactor thread
+        if len(body) > 0 and len(TAG.sub(b"", INVISIBLE.sub(b"", body))) / len(body) > self.max_text_ratio:
+            return self.DIRECT, "text_ratio"
+        return self.READABILITY, None
+
+    def apply(self, item, spider, context):
+        if context.body is None:
+            return item
+        route, reason = self.choose_route(context.body)
+        if reason is not None:
+            logger.debug(f"Skipping readability for url {context.url} because of {reason}")
+            self.stats.inc_value(f"{self.__class__.__name__}/{route}/{reason}")
+        self.stats.inc_value(f"{self.__class__.__name__}/{route}")
+        item[self.ROUTE] = route
+        return item
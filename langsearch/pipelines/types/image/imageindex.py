@@ -47,6 +47,10 @@ class BaseImageIndexPipeline(BasePipeline):
             }
         ],
     }
+    # The crawl DB records when a URL was last seen. If True, `last_seen` of the image of an unchanged URL is also
+    # rewritten.
+    UPDATE_LAST_SEEN = False
+    THREAD_POOL_SIZE = 4
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,49 +59,71 @@ class BaseImageIndexPipeline(BasePipeline):
             class_schema = self.get_params_from_file(class_schema)
         self.class_schema = class_schema
         self.class_name = self.class_schema["class"]
-        if not self.weaviate.class_exists(self.class_name):
-            self.weaviate.create_class(self.class_schema)
+        self.weaviate.register_classes([self.class_schema])
+        update_last_seen = self.__class__.get_setting_from_partial_key(os.environ, "UPDATE_LAST_SEEN")
+        if isinstance(update_last_seen, str):
+            update_last_seen = update_last_seen.lower() in ("1", "true", "yes")
+        self.update_last_seen = update_last_seen
 
-    def apply(self, item, spider):
-        if not hasattr(self, "url"):
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.weaviate.ensure_registered_classes()
+
+    def apply(self, item, spider, context):
+        if context.url is None:
             return item
-        if not hasattr(self, "body"):
+        if context.body is None:
             return item
         try:
-            if hasattr(self, "changed") and not self.changed:
+            if context.changed is not None and not context.changed:
+                if not self.update_last_seen:
+                    return item
                 self.weaviate.update_property_with_current_datetime(
                     class_name=self.class_name,
                     where_filter={
                         "path": ["url"],
                         "operator": "Equal",
-                        "valueString": self.url
+                        "valueString": context.url
                     },
                     property_name="last_seen"
                 )
             else:
-                with BytesIO(self.body) as f:
+                unique_id = self.weaviate.get_uuid(self.class_name, context.url)
+                with BytesIO(context.body) as f:
                     base_64_encoded_image = image_encoder_b64(BufferedReader(f))
-                    self.weaviate.client.data_object.create(
-                        class_name=self.class_name,
-                        data_object={
-                            "url": self.url,
-                            "image": base_64_encoded_image,
-                            "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
-                        }
-                    )
+                self.weaviate.upsert(
+                    self.class_name,
+                    [
+                        (
+                            unique_id,
+                            {
+                                "url": context.url,
+                                "image": base_64_encoded_image,
+                                "last_seen": datetime.datetime.now(datetime.timezone.utc).isoformat()
+                            }
+                        )
+                    ]
+                )
+            return item
         except:
-            message = f"Error while processing item with URL {self.url}"
+            message = f"Error while processing item with URL {context.url}"
             logger.exception(message)
             raise DropItem(message)
 
     def get_image_bytes(self, base_64_encoded_image):
         return image_decoder_b64(base_64_encoded_image)
 
+    def get_result_properties(self):
+        # `last_seen` of an image is only kept up to date if UPDATE_LAST_SEEN is True
+        if self.update_last_seen:
+            return ["url", "image", "last_seen"]
+        return ["url", "image"]
+
     def get_similar_images_from_text(self, text, limit=4):
-        return self.weaviate.get_similar(self.class_name, text, ["url", "image", "last_seen"], limit=limit)
+        return self.weaviate.get_similar(self.class_name, text, self.get_result_properties(), limit=limit)
 
     def get_similar_images_from_image(self, image, top=4):
-        return self.weaviate.get_near_image(self.class_name, image, ["url", "image", "last_seen"], top)
+        return self.weaviate.get_near_image(self.class_name, image, self.get_result_properties(), top)
 
 
 class ImageIndexPipeline(BaseImageIndexPipeline, WeaviateMixin):
@@ -1,3 +1,5 @@
+from langsearch.pipelines.base import response_attribute
+from langsearch.pipelines.common.fingerprint import FingerprintPipeline
 from langsearch.pipelines.common.storeitem import StoreItemPipeline
 from langsearch.pipelines.types.image.resize import ResizeImagePipeline
 from langsearch.pipelines.types.image.imageindex import ImageIndexPipeline
@@ -11,27 +13,35 @@ class GenericImagePipeline:
     ITEM_TYPE = ItemType.IMAGE
 
     ITEM_PIPELINES = {
-        ResizeImagePipeline: 400,
-        StoreItemPipeline: 410,
-        ImageIndexPipeline: 420
+        FingerprintPipeline: 400,
+        ResizeImagePipeline: 410,
+        StoreItemPipeline: 420,
+        ImageIndexPipeline: 430
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     RESIZE_IMAGE_PIPELINE_INPUTS = {
-        "body": lambda item: getattr(item["response"], "body"),
-        "url": lambda item: getattr(item["response"], "url")
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     STORE_ITEM_PIPELINE_INPUTS = {
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT
     }
 
     IMAGE_INDEX_PIPELINE_INPUTS = {
         "body": ResizeImagePipeline.RESIZED_BYTES,
-        "url": lambda item: getattr(item["response"], "url"),
+        "url": response_attribute("url"),
         "changed": StoreItemPipeline.CHANGED
     }
 
     PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
         ResizeImagePipeline: RESIZE_IMAGE_PIPELINE_INPUTS,
         StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
         ImageIndexPipeline: IMAGE_INDEX_PIPELINE_INPUTS
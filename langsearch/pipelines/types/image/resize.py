@@ -42,13 +42,13 @@ class ResizeImagePipeline(BasePipeline):
         else:
             return tuple(int(x * self.scale) for x in original_size)
 
-    def apply(self, item, spider):
-        if not hasattr(self, "body") or self.body is None:
+    def apply(self, item, spider, context):
+        if context.body is None:
             return item
-        if not hasattr(self, "url"):
+        if context.url is None:
             return item
         try:
-            with BytesIO(self.body) as original:
+            with BytesIO(context.body) as original:
                 im = Image.open(original)
                 im_format = im.format
                 resized_size = self.get_resized_size(im.size)
@@ -58,6 +58,6 @@ class ResizeImagePipeline(BasePipeline):
                     item[self.RESIZED_BYTES] = resized.getvalue()
             return item
         except:
-            message = f"Pillow failed to resize image for url {self.url}"
+            message = f"Pillow failed to resize image for url {context.url}"
             logger.exception(message)
             raise DropItem(message)
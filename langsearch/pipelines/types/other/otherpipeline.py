@@ -1,9 +1,12 @@
+from langsearch.pipelines.base import response_attribute
+from langsearch.pipelines.common.fingerprint import FingerprintPipeline
 from langsearch.pipelines.common.index import SimpleIndexPipeline
 from langsearch.pipelines.common.storeitem import StoreItemPipeline
 from langsearch.pipelines.common.python_readability import PythonReadabilityPipeline
 from langsearch.pipelines.common.inscriptis import InscriptisPipeline
 from langsearch.pipelines.common.textsplitter import TextSplitterPipeline
 from langsearch.pipelines.common.tika import TikaPipeline
+from langsearch.pipelines.common.tika_stream import TikaStreamingPipeline
 from langsearch.pipelines.types.enumerations import ItemType
 
 
@@ -11,46 +14,54 @@ class GenericOtherPipeline:
     ITEM_TYPE = ItemType.OTHER
 
     ITEM_PIPELINES = {
-        TikaPipeline: 400,
-        PythonReadabilityPipeline: 410,
-        InscriptisPipeline: 420,
-        TextSplitterPipeline: 430,
-        StoreItemPipeline: 440,
-        SimpleIndexPipeline: 450
+        FingerprintPipeline: 400,
+        TikaPipeline: 410,
+        PythonReadabilityPipeline: 420,
+        InscriptisPipeline: 430,
+        TextSplitterPipeline: 440,
+        StoreItemPipeline: 450,
+        SimpleIndexPipeline: 460
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     TIKA_PIPELINE_INPUTS = {
-        "body": lambda item: getattr(item["response"], "body"),
-        "url": lambda item: getattr(item["response"], "url")
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     PYTHON_READABILITY_PIPELINE_INPUTS = {
         "html": TikaPipeline.XML_OUTPUT,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url")
     }
 
     INSCRIPTIS_PIPELINE_INPUTS = {
-        "html": PythonReadabilityPipeline.HTML_WITHOUT_BP,
-        "url": lambda item: getattr(item["response"], "url")
+        "html": PythonReadabilityPipeline.PARSED_HTML_WITHOUT_BP,
+        "url": response_attribute("url")
     }
 
     TEXT_SPLITTER_PIPELINE_INPUTS = {
         "text": InscriptisPipeline.EXTRACTED_TEXT,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url")
     }
 
     STORE_ITEM_PIPELINE_INPUTS = {
         "text": InscriptisPipeline.EXTRACTED_TEXT,
-        "url": lambda item: getattr(item["response"], "url")
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT
     }
 
     SIMPLE_INDEX_PIPELINE_INPUTS = {
         "sections": TextSplitterPipeline.SECTIONS,
-        "url": lambda item: getattr(item["response"], "url"),
+        "url": response_attribute("url"),
         "changed": StoreItemPipeline.CHANGED
     }
 
     PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
         TikaPipeline: TIKA_PIPELINE_INPUTS,
         PythonReadabilityPipeline: PYTHON_READABILITY_PIPELINE_INPUTS,
         InscriptisPipeline: INSCRIPTIS_PIPELINE_INPUTS,
@@ -58,3 +69,103 @@ class GenericOtherPipeline:
         StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
         SimpleIndexPipeline: SIMPLE_INDEX_PIPELINE_INPUTS
     }
+
+
+class GenericStreamingOtherPipeline:
+    """
+    Like GenericOtherPipeline, but extracts and splits the text page by page while Tika streams it, which bounds the
+    memory needed for very large PDFs and office documents. There is no boilerplate removal.
+    """
+    ITEM_TYPE = ItemType.OTHER
+
+    ITEM_PIPELINES = {
+        FingerprintPipeline: 400,
+        TikaStreamingPipeline: 410,
+        StoreItemPipeline: 420,
+        SimpleIndexPipeline: 430
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = GenericOtherPipeline.FINGERPRINT_PIPELINE_INPUTS
+
+    TIKA_STREAMING_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
+    }
+
+    STORE_ITEM_PIPELINE_INPUTS = {
+        "text": TikaStreamingPipeline.EXTRACTED_TEXT,
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT,
+        "text_fingerprint": TikaStreamingPipeline.TEXT_FINGERPRINT,
+        "text_simhash": TikaStreamingPipeline.TEXT_SIMHASH
+    }
+
+    SIMPLE_INDEX_PIPELINE_INPUTS = {
+        "sections": TikaStreamingPipeline.SECTIONS,
+        "url": response_attribute("url"),
+        "changed": StoreItemPipeline.CHANGED
+    }
+
+    PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
+        TikaStreamingPipeline: TIKA_STREAMING_PIPELINE_INPUTS,
+        StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
+        SimpleIndexPipeline: SIMPLE_INDEX_PIPELINE_INPUTS
+    }
+
+
+class GenericDocumentPipeline:
+    """
+    Handles PDFs and office documents, whose Tika output has no boilerplate to remove. It is like GenericOtherPipeline
+    without the PythonReadabilityPipeline. Assemble it together with GenericOtherPipeline, which then handles the
+    remaining items of ItemType.OTHER.
+    """
+    ITEM_TYPE = ItemType.OTHER
+    MIME_TYPES = {
+        "application/pdf",
+        "application/msword",
+        "application/vnd.ms-excel",
+        "application/vnd.ms-powerpoint",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "application/vnd.oasis.opendocument.text",
+        "application/vnd.oasis.opendocument.spreadsheet",
+        "application/vnd.oasis.opendocument.presentation",
+        "application/rtf",
+        "application/x-tika-msoffice",
+        "application/x-tika-ooxml",
+    }
+
+    ITEM_PIPELINES = {
+        FingerprintPipeline: 400,
+        TikaPipeline: 410,
+        InscriptisPipeline: 430,
+        TextSplitterPipeline: 440,
+        StoreItemPipeline: 450,
+        SimpleIndexPipeline: 460
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = GenericOtherPipeline.FINGERPRINT_PIPELINE_INPUTS
+
+    TIKA_PIPELINE_INPUTS = GenericOtherPipeline.TIKA_PIPELINE_INPUTS
+
+    INSCRIPTIS_PIPELINE_INPUTS = {
+        "html": TikaPipeline.XML_OUTPUT,
+        "url": response_attribute("url")
+    }
+
+    TEXT_SPLITTER_PIPELINE_INPUTS = GenericOtherPipeline.TEXT_SPLITTER_PIPELINE_INPUTS
+
+    STORE_ITEM_PIPELINE_INPUTS = GenericOtherPipeline.STORE_ITEM_PIPELINE_INPUTS
+
+    SIMPLE_INDEX_PIPELINE_INPUTS = GenericOtherPipeline.SIMPLE_INDEX_PIPELINE_INPUTS
+
+    PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
+        TikaPipeline: TIKA_PIPELINE_INPUTS,
+        InscriptisPipeline: INSCRIPTIS_PIPELINE_INPUTS,
+        TextSplitterPipeline: TEXT_SPLITTER_PIPELINE_INPUTS,
+        StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
+        SimpleIndexPipeline: SIMPLE_INDEX_PIPELINE_INPUTS
+    }
@@ -1,7 +1,8 @@
+from langsearch.pipelines.base import response_attribute
+from langsearch.pipelines.common.fingerprint import FingerprintPipeline
 from langsearch.pipelines.common.index import SimpleIndexPipeline
 from langsearch.pipelines.common.storeitem import StoreItemPipeline
 from langsearch.pipelines.common.textsplitter import TextSplitterPipeline
-from langsearch.pipelines.common.inscriptis import InscriptisPipeline
 from langsearch.pipelines.types.enumerations import ItemType
 
 
@@ -12,28 +13,36 @@ class GenericPlainTextPipeline:
     ITEM_TYPE = ItemType.TEXT
 
     ITEM_PIPELINES = {
-        TextSplitterPipeline: 400,
-        StoreItemPipeline: 410,
-        SimpleIndexPipeline: 420
+        FingerprintPipeline: 400,
+        TextSplitterPipeline: 410,
+        StoreItemPipeline: 420,
+        SimpleIndexPipeline: 430
+    }
+
+    FINGERPRINT_PIPELINE_INPUTS = {
+        "body": response_attribute("body"),
+        "url": response_attribute("url")
     }
 
     TEXT_SPLITTER_PIPELINE_INPUTS = {
-        "text": lambda item: getattr(item["response"], "text"),
-        "url": lambda item: getattr(item["response"], "url")
+        "text": response_attribute("text"),
+        "url": response_attribute("url")
     }
 
     STORE_ITEM_PIPELINE_INPUTS = {
-        "text": InscriptisPipeline.EXTRACTED_TEXT,
-        "url": lambda item: getattr(item["response"], "url")
+        "text": response_attribute("text"),
+        "url": response_attribute("url"),
+        "body_fingerprint": FingerprintPipeline.BODY_FINGERPRINT
     }
 
     SIMPLE_INDEX_PIPELINE_INPUTS = {
         "sections": TextSplitterPipeline.SECTIONS,
-        "url": lambda item: getattr(item["response"], "url"),
+        "url": response_attribute("url"),
         "changed": StoreItemPipeline.CHANGED
     }
 
     PIPELINE_INPUTS = {
+        FingerprintPipeline: FINGERPRINT_PIPELINE_INPUTS,
         TextSplitterPipeline: TEXT_SPLITTER_PIPELINE_INPUTS,
         StoreItemPipeline: STORE_ITEM_PIPELINE_INPUTS,
         SimpleIndexPipeline: SIMPLE_INDEX_PIPELINE_INPUTS
@@ -0,0 +1,122 @@
+from langsearch.tokens import DEFAULT_ENCODING, get_encoding
+
+
+class RecursiveTokenTextSplitter:
+    """
+    Splits text into sections of at most `chunk_size` tokens. Like langchain's RecursiveCharacterTextSplitter, it splits
+    at the first of `separators` found in the text and merges the pieces into sections, and splits pieces that are too
+    long with the next separator. But it encodes the text only once and chooses the split points over the tokens, so
+    it knows the token count of each section without counting again.
+    """
+    def __init__(self, chunk_size=512, separators=None, encoding_name=DEFAULT_ENCODING):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        self.chunk_size = chunk_size
+        if separators is None:
+            separators = ["\n\n", "\n", " ", ""]
+        self.separators = [separator.encode("utf-8") for separator in separators]
+        if self.separators[-1] != b"":
+            # Sections must never exceed chunk_size, so there must be a way to split anywhere
+            self.separators.append(b"")
+        self.encoding_name = encoding_name
+        self.token_lengths = {}
+
+    @property
+    def encoding(self):
+        # Loaded on first use, so that the tiktoken cache directory can still be configured in open_spider(). It isn't
+        # kept on the splitter, since tiktoken encodings can't be pickled.
+        return get_encoding(self.encoding_name)
+
+    def split_text(self, text):
+        return [section for section, _count in self.split_text_with_counts(text)]
+
+    def split_text_with_counts(self, text):
+        """
+        Returns a list of (section, token_count) tuples.
+        """
+        data = text.encode("utf-8")
+        tokens = self.encoding.encode(text, disallowed_special=())
+        # offsets[i] is the byte offset in data where token i starts
+        offsets = [0]
+        for token in tokens:
+            try:
+                length = self.token_lengths[token]
+            except KeyError:
+                length = len(self.encoding.decode_bytes([token]))
+                self.token_lengths[token] = length
+            offsets.append(offsets[-1] + length)
+        boundaries = {offset: i for i, offset in enumerate(offsets)}
+        result = []
+        for start, end in self.split_span(data, offsets, boundaries, 0, len(tokens), 0):
+            # Drop whitespace tokens at both ends
+            while start < end and data[offsets[start]:offsets[start + 1]].isspace():
+                start += 1
+            while end > start and data[offsets[end - 1]:offsets[end]].isspace():
+                end -= 1
+            if start < end:
+                section = data[offsets[start]:offsets[end]].decode("utf-8", "replace")
+                stripped = section.strip()
+                if len(stripped) == len(section):
+                    count = end - start
+                else:
+                    # A token at an end carries whitespace, e.g. " word", so the stripped section has other tokens
+                    count = len(self.encoding.encode(stripped, disallowed_special=()))
+                result.append((stripped, count))
+        return result
+
+    def split_span(self, data, offsets, boundaries, start, end, level):
+        """
+        Splits the tokens from `start` to `end` into spans of at most chunk_size tokens, using the separators from
+        `level` on. Returns a list of (start, end) tuples.
+        """
+        if end - start <= self.chunk_size:
+            return [(start, end)]
+        level, cuts = self.get_cuts(data, offsets, boundaries, start, end, level)
+        spans = []
+        current = None
+        for piece_start, piece_end in zip([start, *cuts], [*cuts, end]):
+            if piece_end - piece_start > self.chunk_size:
+                if current is not None:
+                    spans.append((current, piece_start))
+                    current = None
+                spans.extend(self.split_span(data, offsets, boundaries, piece_start, piece_end, level + 1))
+                continue
+            if current is None:
+                current = piece_start
+            elif piece_end - current > self.chunk_size:
+                spans.append((current, piece_start))
+                current = piece_start
+        if current is not None:
+            spans.append((current, end))
+        return spans
+
+    def get_cuts(self, data, offsets, boundaries, start, end, level):
+        """
+        Returns the level of the first separator from `level` on that occurs between the tokens `start` and `end`,
+        and the token indices where the span can be cut at that separator.
+        """
+        start_offset, end_offset = offsets[start], offsets[end]
+        for level in range(level, len(self.separators)):
+            separator = self.separators[level]
+            if separator == b"":
+                break
+            cuts = []
+            position = data.find(separator, start_offset, end_offset)
+            while position != -1:
+                # Tokens usually start or end at a separator
+                cut = boundaries.get(position + len(separator), boundaries.get(position))
+                if cut is not None and start < cut < end and (len(cuts) == 0 or cut > cuts[-1]):
+                    cuts.append(cut)
+                position = data.find(separator, position + len(separator), end_offset)
+            if len(cuts) > 0:
+                return level, cuts
+        # Cut anywhere, but not within a UTF-8 character
+        cuts = []
+        cut = start
+        while end - cut > self.chunk_size:
+            next_cut = cut + self.chunk_size
+            while next_cut > cut + 1 and 0x80 <= data[offsets[next_cut]] < 0xC0:
+                next_cut -= 1
+            cuts.append(next_cut)
+            cut = next_cut
+        return len(self.separators) - 1, cuts
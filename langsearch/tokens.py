@@ -0,0 +1,166 @@
+import argparse
+from collections import OrderedDict
+import functools
+import hashlib
+import os
+import threading
+
+import tiktoken
+
+
+# Setting and environment variable with a local directory of tiktoken encoding files
+CACHE_DIR_SETTING = "LANGSEARCH_TIKTOKEN_CACHE_DIR"
+DEFAULT_ENCODING = "gpt2"
+# Maximum number of token counts kept per encoding
+CACHE_SIZE = 65536
+# Texts up to this length are their own cache key, longer texts are keyed by a hash
+MAX_KEY_LENGTH = 64
+
+
+def set_cache_dir(cache_dir):
+    """
+    This function will make tiktoken load encoding files from the given directory, and only download the ones missing
+    there. Use `python -m langsearch.tokens <cache_dir>` to fill the directory for hosts without network access.
+    :param cache_dir: A directory path.
+    """
+    # Older versions of tiktoken only read DATA_GYM_CACHE_DIR
+    os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+    os.environ["DATA_GYM_CACHE_DIR"] = cache_dir
+
+
+def configure(settings):
+    """
+    This function will set the tiktoken cache directory from the setting LANGSEARCH_TIKTOKEN_CACHE_DIR, if it is set.
+    :param settings: Scrapy settings or any other dict like object, e.g. os.environ.
+    """
+    cache_dir = settings.get(CACHE_DIR_SETTING)
+    if cache_dir:
+        set_cache_dir(cache_dir)
+
+
+def warm_up(encoding_name=DEFAULT_ENCODING):
+    """
+    This function will load the encoding, so that the first token count doesn't pay for loading or downloading it.
+    :param encoding_name: The name of a tiktoken encoding.
+    """
+    get_token_counter(encoding_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name=DEFAULT_ENCODING):
+    """
+    This function will return the tiktoken encoding with the given name. The encoding is loaded only once per process.
+    :param encoding_name: The name of a tiktoken encoding.
+    :return: A tiktoken.Encoding.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+class TokenCounter:
+    """
+    Counts tokens of texts with a tiktoken encoding and keeps the counts in a bounded LRU cache, since the same texts
+    are counted again and again while splitting, summarizing and trimming them.
+    """
+    def __init__(self, encoding_name=DEFAULT_ENCODING, cache_size=CACHE_SIZE):
+        self.encoding = get_encoding(encoding_name)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(text):
+        if len(text) <= MAX_KEY_LENGTH:
+            return text
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_cached(self, key):
+        with self.lock:
+            try:
+                count = self.cache[key]
+            except KeyError:
+                return None
+            self.cache.move_to_end(key)
+            return count
+
+    def set_cached(self, key, count):
+        with self.lock:
+            self.cache[key] = count
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def count(self, text):
+        key = self.get_key(text)
+        count = self.get_cached(key)
+        if count is None:
+            count = len(self.encoding.encode(text))
+            self.set_cached(key, count)
+        return count
+
+    def count_batch(self, texts):
+        """
+        Counts the tokens of all `texts`, encoding the ones that are not cached in one batch.
+        """
+        keys = [self.get_key(text) for text in texts]
+        counts = [self.get_cached(key) for key in keys]
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if len(missing) > 0:
+            encoded = self.encoding.encode_batch([texts[i] for i in missing])
+            for i, tokens in zip(missing, encoded):
+                counts[i] = len(tokens)
+                self.set_cached(keys[i], counts[i])
+        return counts
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(encoding_name=DEFAULT_ENCODING):
+    """
+    This function will return the process wide TokenCounter for the given encoding.
+    :param encoding_name: The name of a tiktoken encoding.
+    :return: A TokenCounter.
+    """
+    try:
+        return _counters[encoding_name]
+    except KeyError:
+        with _counters_lock:
+            if encoding_name not in _counters:
+                _counters[encoding_name] = TokenCounter(encoding_name)
+            return _counters[encoding_name]
+
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    """
+    This function will take a string and return the number of tokens in it.
+    :param text: A string.
+    :param encoding_name: The name of a tiktoken encoding.
+    :return: The number of tokens of the string in the encoding.
+    """
+    return get_token_counter(encoding_name).count(text)
+
+
+def count_tokens_batch(texts, encoding_name=DEFAULT_ENCODING):
+    """
+    This function will take a list of strings and return the number of tokens in each of them.
+    :param texts: A list of strings.
+    :param encoding_name: The name of a tiktoken encoding.
+    :return: A list with the number of tokens of each string in the encoding.
+    """
+    return get_token_counter(encoding_name).count_batch(list(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downloads tiktoken encodings to a local cache directory")
+    parser.add_argument("cache_dir")
+    parser.add_argument("encoding_names", nargs="*", default=[DEFAULT_ENCODING])
+    args = parser.parse_args()
+    set_cache_dir(args.cache_dir)
+    for encoding_name in args.encoding_names:
+        get_encoding(encoding_name)
+        print(f"Cached encoding {encoding_name} in {args.cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
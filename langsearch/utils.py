@@ -1,6 +1,8 @@
+from collections import Counter
+import hashlib
 import re
 
-import tiktoken
+from langsearch.tokens import count_tokens
 
 
 def get_regex_from_list(list_to_convert):
@@ -20,7 +22,108 @@ def openai_length_function(text):
     :param text: A string.
     :return: The length of the string as if it were encoded by openai.
     """
-    return len(tiktoken.get_encoding("gpt2").encode(text))
+    return count_tokens(text)
 
 
+def normalize_text(text):
+    """
+    This function will collapse all whitespace in a string, so that formatting changes don't count as content changes.
+    :param text: A string.
+    :return: The normalized string.
+    """
+    return " ".join(text.split())
+
+
+def text_fingerprint(text):
+    """
+    This function will return the SHA-256 hex digest of the normalized string.
+    :param text: A string.
+    :return: A hex string.
+    """
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def simhash(text, shingle_size=3):
+    """
+    This function will return the 64 bit SimHash of the word shingles of the normalized string. Similar strings have
+    SimHashes that differ in few bits.
+    :param text: A string.
+    :param shingle_size: Number of words in a shingle.
+    :return: The SimHash as a hex string of length 16.
+    """
+    digest = TextDigest(shingle_size)
+    digest.update(text)
+    return digest.simhash()
+
+
+class TextDigest:
+    """
+    Computes text_fingerprint() and simhash() of a text that is given in parts, e.g. page by page, without keeping the
+    text. The parts are joined with whitespace, so the results are those of the parts joined with "\n\n".
+    """
+    def __init__(self, shingle_size=3):
+        self.shingle_size = shingle_size
+        self.sha256 = hashlib.sha256()
+        self.word_count = 0
+        # The last shingle_size - 1 words, which start shingles that end in the next part
+        self.window = []
+        self.shingle_count = 0
+        # Number of shingle hashes with each of the 64 bits set
+        self.bit_counts = [0] * 64
+
+    def update(self, text):
+        normalized = normalize_text(text)
+        if normalized == "":
+            return
+        self.sha256.update(((" " if self.word_count > 0 else "") + normalized).encode())
+        words = self.window + normalized.lower().split(" ")
+        self.word_count += len(words) - len(self.window)
+        self.shingle_count += self.add_shingles(
+            [" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)],
+            self.bit_counts
+        )
+        self.window = words[len(words) - self.shingle_size + 1:] if self.shingle_size > 1 else []
 
+    def add_shingles(self, shingles, bit_counts):
+        digests = b"".join(hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles)
+        for byte_index in range(8):
+            # Count the values of this byte over all shingle hashes, then count the set bits from the value counts.
+            value_counts = Counter(digests[byte_index::8])
+            for bit in range(8):
+                bit_counts[8 * (7 - byte_index) + bit] += sum(
+                    count for value, count in value_counts.items() if value & (1 << bit)
+                )
+        return len(shingles)
+
+    def fingerprint(self):
+        """
+        Returns text_fingerprint() of the text so far.
+        """
+        return self.sha256.hexdigest()
+
+    def simhash(self):
+        """
+        Returns simhash() of the text so far.
+        """
+        bit_counts = self.bit_counts
+        shingle_count = self.shingle_count
+        if self.word_count < self.shingle_size:
+            # A text with fewer words than a shingle is one shorter shingle
+            bit_counts = list(bit_counts)
+            shingle_count += self.add_shingles([" ".join(self.window)], bit_counts)
+        result = 0
+        for position, set_count in enumerate(bit_counts):
+            if 2 * set_count > shingle_count:
+                result |= 1 << position
+        return f"{result:016x}"
+
+
+def simhash_similarity(simhash1, simhash2):
+    """
+    This function will return the similarity of two SimHashes as a percentage of equal bits.
+    :param simhash1: A SimHash returned by simhash().
+    :param simhash2: A SimHash returned by simhash().
+    :return: A float between 0 and 100.
+    """
+    differing_bits = bin(int(simhash1, 16) ^ int(simhash2, 16)).count("1")
+    return (64 - differing_bits) / 64 * 100
@@ -0,0 +1,72 @@
+from langsearch.pipelines.base import BasePipeline
+from langsearch.pipelines.types.enumerations import ItemType
+
+
+class UpperPipeline(BasePipeline):
+    INPUTS = {
+        "text": "text"
+    }
+    UPPER = "upper_pipeline_upper"
+
+    def apply(self, item, spider, context):
+        if context.text is None:
+            return item
+        item[self.UPPER] = context.text.upper()
+        return item
+
+
+class LegacyUpperPipeline(UpperPipeline):
+    def apply(self, item, spider):
+        self.text = self.text.strip()
+        item = super().apply(item, spider)
+        item["legacy"] = True
+        return item
+
+
+class LegacyPipeline(BasePipeline):
+    INPUTS = {
+        "text": "text"
+    }
+
+    def apply(self, item, spider):
+        item["legacy_text"] = self.text
+        return item
+
+
+class ContextOverLegacyPipeline(LegacyPipeline):
+    def apply(self, item, spider, context):
+        item = super().apply(item, spider, context)
+        item["context_text"] = context.text
+        return item
+
+
+def make_item(text):
+    return {"type": ItemType.TEXT, "text": text}
+
+
+def test_apply_with_context():
+    item = UpperPipeline().process_item(make_item("abc"), None)
+    assert item[UpperPipeline.UPPER] == "ABC"
+
+
+def test_legacy_subclass_calls_super_apply():
+    pipeline = LegacyUpperPipeline()
+    item = pipeline.process_item(make_item("  abc "), None)
+    assert item[UpperPipeline.UPPER] == "ABC"
+    assert item["legacy"]
+    # The inputs are set on a copy of the pipeline
+    assert not hasattr(pipeline, "text")
+
+
+def test_subclass_with_context_calls_legacy_super_apply():
+    pipeline = ContextOverLegacyPipeline()
+    item = pipeline.process_item(make_item("abc"), None)
+    assert item["legacy_text"] == "abc"
+    assert item["context_text"] == "abc"
+    assert not hasattr(pipeline, "text")
+
+
+def test_skip():
+    item = make_item("abc")
+    item[BasePipeline.SKIP] = True
+    assert UpperPipeline.UPPER not in UpperPipeline().process_item(item, None)
@@ -0,0 +1,136 @@
+import time
+from types import SimpleNamespace
+
+from lxml import etree
+import pytest
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse
+
+from langsearch.exceptions import BudgetExceeded
+from langsearch.pipelines.base import BasePipeline, ItemContext, response_attribute
+from langsearch.pipelines.budget import BudgetWorkerPool
+from langsearch.pipelines.types.enumerations import ItemType
+
+
+class SleepPipeline(BasePipeline):
+    INPUTS = {
+        "seconds": "seconds",
+        "url": response_attribute("url")
+    }
+    TIME_BUDGET = 1
+
+    def apply(self, item, spider, context):
+        if context.seconds < 0:
+            raise DropItem(f"Negative seconds for url {context.url}")
+        time.sleep(context.seconds)
+        item["slept"] = context.seconds
+        item["tree"] = etree.HTML("<p>slept</p>")
+        item.pop("removed", None)
+        return item
+
+
+class TagPipeline(BasePipeline):
+    INPUTS = {}
+
+    def apply(self, item, spider, context):
+        item["metadata"]["tags"].append("tagged")
+        return item
+
+
+def make_item(seconds):
+    return {
+        "type": ItemType.TEXT,
+        "seconds": seconds,
+        "removed": True,
+        "response": HtmlResponse("https://example.com", body=b"<p>body</p>", encoding="utf-8")
+    }
+
+
+def make_pipeline(on_budget_exceeded="drop"):
+    pipeline = SleepPipeline()
+    settings = {"LANGSEARCH_SLEEPPIPELINE_ON_BUDGET_EXCEEDED": on_budget_exceeded}
+    pipeline.configure_time_budget(SimpleNamespace(settings=settings))
+    return pipeline
+
+
+def test_result_round_trip():
+    pipeline = SleepPipeline()
+    workers = BudgetWorkerPool(pipeline)
+    try:
+        item = make_item(0)
+        response = item["response"]
+        context = ItemContext(seconds=0, url=response.url)
+        assert workers.run_with_budget(item, context, 10) is item
+        assert item["slept"] == 0
+        assert item["tree"].xpath("string()") == "slept"
+        assert "removed" not in item
+        # Unchanged values are not sent back
+        assert item["response"] is response
+    finally:
+        workers.close()
+
+
+def test_nested_change_is_sent_back():
+    workers = BudgetWorkerPool(TagPipeline())
+    try:
+        item = make_item(0)
+        item["metadata"] = {"tags": ["new"]}
+        response = item["response"]
+        assert workers.run_with_budget(item, ItemContext(), 10) is item
+        assert item["metadata"] == {"tags": ["new", "tagged"]}
+        assert item["response"] is response
+    finally:
+        workers.close()
+
+
+def test_worker_is_reused():
+    workers = BudgetWorkerPool(SleepPipeline())
+    try:
+        workers.run_with_budget(make_item(0), ItemContext(seconds=0, url=None), 10)
+        worker = workers.idle[0]
+        workers.run_with_budget(make_item(0), ItemContext(seconds=0, url=None), 10)
+        assert workers.idle == [worker]
+    finally:
+        workers.close()
+
+
+def test_timeout_kills_worker():
+    workers = BudgetWorkerPool(SleepPipeline())
+    try:
+        with pytest.raises(TimeoutError):
+            workers.run_with_budget(make_item(5), ItemContext(seconds=5, url=None), 0.5)
+        assert workers.idle == []
+        # The next item gets a new worker
+        item = workers.run_with_budget(make_item(0), ItemContext(seconds=0, url=None), 10)
+        assert item["slept"] == 0
+    finally:
+        workers.close()
+
+
+def test_exception_is_raised_again():
+    workers = BudgetWorkerPool(SleepPipeline())
+    try:
+        with pytest.raises(DropItem, match="Negative seconds for url https://example.com"):
+            workers.run_with_budget(make_item(-1), ItemContext(seconds=-1, url="https://example.com"), 10)
+    finally:
+        workers.close()
+
+
+def test_budget_exceeded_drops_item():
+    pipeline = make_pipeline()
+    try:
+        with pytest.raises(BudgetExceeded) as info:
+            pipeline.apply_item(make_item(5), None)
+        assert info.value.pipeline == "SleepPipeline"
+    finally:
+        pipeline.budget_workers.close()
+
+
+def test_budget_exceeded_skips_item():
+    pipeline = make_pipeline("skip")
+    try:
+        item = pipeline.apply_item(make_item(5), None)
+        assert "slept" not in item
+        assert item[BasePipeline.BUDGET_EXCEEDED] == ["SleepPipeline"]
+    finally:
+        pipeline.budget_workers.close()
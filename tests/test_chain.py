@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from langsearch.pipelines.base import BasePipeline, response_attribute
+from langsearch.pipelines.chain import ExtractionChainPipeline, WorkerSpider, _run_chain
+from langsearch.pipelines.types.enumerations import ItemType
+
+
+class GreetingPipeline(BasePipeline):
+    INPUTS = {
+        "url": response_attribute("url")
+    }
+    GREETING = "hello"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.greeting = None
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.greeting = self.__class__.get_setting_from_partial_key(spider.settings, "GREETING")
+
+    def apply(self, item, spider, context):
+        item["greeting"] = f"{self.greeting} {context.url}"
+        return item
+
+
+def make_spider():
+    settings = Settings({
+        "LANGSEARCH_GREETINGPIPELINE_GREETING": "hi",
+        "LANGSEARCH_EXTRACTIONCHAINPIPELINE_PROCESS_POOL_SIZE": 1,
+        "LANGSEARCH_UNPICKLABLE": lambda: None,
+        "BOT_NAME": "test"
+    })
+    return SimpleNamespace(name="test", settings=settings, crawler=SimpleNamespace(stats=None))
+
+
+def test_worker_spider_keeps_picklable_langsearch_settings():
+    spider = WorkerSpider.from_spider(make_spider())
+    assert spider.name == "test"
+    assert spider.settings == {
+        "LANGSEARCH_GREETINGPIPELINE_GREETING": "hi",
+        "LANGSEARCH_EXTRACTIONCHAINPIPELINE_PROCESS_POOL_SIZE": 1
+    }
+
+
+def test_stages_are_opened_in_workers():
+    stage = GreetingPipeline()
+    chain = ExtractionChainPipeline({ItemType.TEXT: [stage]})
+    chain.open_spider(make_spider())
+    try:
+        item = {
+            "type": ItemType.TEXT,
+            "response": HtmlResponse("https://example.com", body=b"<p>body</p>", encoding="utf-8")
+        }
+        result = chain.executor.submit(_run_chain, ItemType.TEXT, item, frozenset()).result(timeout=60)
+        assert result == {"greeting": "hi https://example.com"}
+        # The stage of the crawler process is not opened
+        assert stage.greeting is None
+    finally:
+        executor = chain.executor
+        chain.executor = None
+        executor.shutdown()
@@ -0,0 +1,84 @@
+from scrapy.http import Response
+
+from langsearch.pipelines.common import tika_client
+from langsearch.pipelines.detect import DetectItemTypePipeline
+from langsearch.pipelines.types.enumerations import ItemType
+
+
+class FakeTikaClient:
+    def __init__(self, mime_type):
+        self.mime_type = mime_type
+        self.bodies = []
+
+    def detect(self, body):
+        self.bodies.append(body)
+        return self.mime_type
+
+
+def make_pipeline(monkeypatch, tika_mime_type="application/octet-stream"):
+    client = FakeTikaClient(tika_mime_type)
+    monkeypatch.setattr(tika_client, "get_client", lambda settings: client)
+    return DetectItemTypePipeline(1000, settings={}), client
+
+
+def test_magic_bytes_beat_extension_and_header(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch)
+    response = Response(
+        "file:///data/report.txt", body=b"%PDF-1.7\n" + b"x" * 100, headers={"Content-Type": "text/plain"}
+    )
+    assert pipeline.detect(response) == "application/pdf"
+    assert client.bodies == []
+
+
+def test_container_uses_extension(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch)
+    response = Response("file:///data/letter.docx", body=b"PK\x03\x04" + b"\x00" * 100)
+    assert pipeline.detect(response) == (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    # A container without a telling extension or header stays a container
+    response = Response("https://example.com/download", body=b"PK\x03\x04" + b"\x00" * 100)
+    assert pipeline.detect(response) == "application/zip"
+    assert client.bodies == []
+
+
+def test_extension_beats_header(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch)
+    response = Response("file:///data/notes.md", body=b"# Notes", headers={"Content-Type": "text/plain"})
+    assert pipeline.detect(response) == "text/markdown"
+
+
+def test_header_fallback(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch)
+    response = Response(
+        "https://example.com/page", body=b"plain words", headers={"Content-Type": "text/plain; charset=utf-8"}
+    )
+    assert pipeline.detect(response) == "text/plain"
+    assert client.bodies == []
+
+
+def test_tika_gets_prefix_when_ambiguous(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch, "text/csv")
+    response = Response(
+        "https://example.com/export", body=b"a,b\n" * 1000, headers={"Content-Type": "application/octet-stream"}
+    )
+    assert pipeline.detect(response) == "text/csv"
+    assert client.bodies == [response.body[:1000]]
+
+
+def test_cache_by_extension_and_content_type(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch, "text/x-log")
+    first = Response("file:///logs/a.unknownext", body=b"line one")
+    second = Response("file:///logs/b.unknownext", body=b"line two")
+    assert pipeline.detect(first) == "text/x-log"
+    assert pipeline.detect(second) == "text/x-log"
+    assert len(client.bodies) == 1
+    assert pipeline.cache == {(".unknownext", ""): "text/x-log"}
+
+
+def test_apply_sets_item_type(monkeypatch):
+    pipeline, client = make_pipeline(monkeypatch)
+    response = Response("https://example.com/", body=b"<!DOCTYPE html><html></html>")
+    item = pipeline.apply({"response": response}, None)
+    assert item[DetectItemTypePipeline.MIME_TYPE] == "text/html"
+    assert item["type"] == ItemType.HTML
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from scrapy.exceptions import DropItem
+
+from langsearch.pipelines.base import ItemContext
+from langsearch.pipelines.common.fingerprint import BaseFingerprintPipeline, FingerprintPipeline
+from langsearch.pipelines.common.mixins.weaviatedb import WeaviateDB
+
+URL = "https://example.com/page"
+BODY = b"<p>unchanged</p>"
+
+
+class FakeDataObject:
+    def __init__(self, stored, error=None):
+        self.stored = stored
+        self.error = error
+        self.updates = []
+
+    def get_by_id(self, uuid, class_name):
+        return self.stored.get((class_name, uuid))
+
+    def update(self, class_name, uuid, data_object):
+        if self.error is not None:
+            raise self.error
+        self.updates.append((class_name, uuid, data_object))
+
+
+class FakeWeaviate:
+    def __init__(self, stored, error=None):
+        self.client = SimpleNamespace(data_object=FakeDataObject(stored, error))
+
+    @staticmethod
+    def get_uuid(class_name, *keys):
+        return WeaviateDB.get_uuid(class_name, *keys)
+
+    def register_classes(self, schemas):
+        pass
+
+
+def make_pipeline(stored_fingerprint, error=None):
+    class_name = BaseFingerprintPipeline.CLASS_SCHEMA["class"]
+    stored = {}
+    if stored_fingerprint is not None:
+        uuid = WeaviateDB.get_uuid(class_name, URL)
+        stored[(class_name, uuid)] = {"properties": {"body_fingerprint": stored_fingerprint}}
+    pipeline_class = type(
+        "TestFingerprintPipeline", (BaseFingerprintPipeline,), {"weaviate": FakeWeaviate(stored, error)}
+    )
+    return pipeline_class()
+
+
+def make_context(body=BODY):
+    return ItemContext(body=body, url=URL)
+
+
+def test_unchanged_item_is_skipped():
+    pipeline = make_pipeline(hashlib.sha256(BODY).hexdigest())
+    item = pipeline.apply({}, None, make_context())
+    assert item[BaseFingerprintPipeline.SKIP] is True
+    assert item[BaseFingerprintPipeline.CHANGED] is False
+    [(class_name, uuid, data_object)] = pipeline.weaviate.client.data_object.updates
+    assert uuid == WeaviateDB.get_uuid(class_name, URL)
+    assert list(data_object) == ["last_seen"]
+
+
+@pytest.mark.parametrize("stored_fingerprint", [None, hashlib.sha256(b"<p>changed</p>").hexdigest()])
+def test_new_or_changed_item_is_not_skipped(stored_fingerprint):
+    pipeline = make_pipeline(stored_fingerprint)
+    item = pipeline.apply({}, None, make_context())
+    assert item[BaseFingerprintPipeline.BODY_FINGERPRINT] == hashlib.sha256(BODY).hexdigest()
+    assert BaseFingerprintPipeline.SKIP not in item
+    assert BaseFingerprintPipeline.CHANGED not in item
+    assert pipeline.weaviate.client.data_object.updates == []
+
+
+def test_item_without_body_is_passed_on():
+    pipeline = make_pipeline(None)
+    assert pipeline.apply({}, None, make_context(None)) == {}
+
+
+def test_weaviate_error_drops_item():
+    pipeline = make_pipeline(hashlib.sha256(BODY).hexdigest(), ConnectionError("Weaviate is down"))
+    with pytest.raises(DropItem):
+        pipeline.apply({}, None, make_context())
+
+
+def test_store_item_settings_apply(monkeypatch, tmp_path):
+    class_schema = dict(BaseFingerprintPipeline.CLASS_SCHEMA, **{"class": "ProjectCrawlData"})
+    schema_path = tmp_path / "crawl_data.json"
+    schema_path.write_text(json.dumps(class_schema))
+    monkeypatch.setenv("LANGSEARCH_STOREITEMPIPELINE_CLASS_SCHEMA", str(schema_path))
+    monkeypatch.setenv("LANGSEARCH_STOREITEMPIPELINE_STORE_TEXT", "true")
+    uuid = WeaviateDB.get_uuid("ProjectCrawlData", URL)
+    stored = {("ProjectCrawlData", uuid): {"properties": {"body_fingerprint": hashlib.sha256(BODY).hexdigest()}}}
+    pipeline_class = type("TestFingerprintPipeline", (BaseFingerprintPipeline,), {"weaviate": FakeWeaviate(stored)})
+    pipeline = pipeline_class()
+    assert pipeline.class_name == "ProjectCrawlData"
+    assert pipeline.store_text is True
+    item = pipeline.apply({}, None, make_context())
+    assert item[BaseFingerprintPipeline.SKIP] is True
+
+
+def test_own_settings_beat_store_item_settings(monkeypatch):
+    monkeypatch.setenv("LANGSEARCH_STOREITEMPIPELINE_STORE_TEXT", "true")
+    monkeypatch.setenv("LANGSEARCH_FINGERPRINTPIPELINE_STORE_TEXT", "false")
+    assert FingerprintPipeline.get_setting_from_partial_key(os.environ, "STORE_TEXT") == "false"
+    # Settings that are not shared are not read from the StoreItemPipeline
+    monkeypatch.setenv("LANGSEARCH_STOREITEMPIPELINE_THREAD_POOL_SIZE", "16")
+    assert FingerprintPipeline.get_setting_from_partial_key(os.environ, "THREAD_POOL_SIZE") == 4
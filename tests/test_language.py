@@ -0,0 +1,36 @@
+import pytest
+
+from langsearch.language import LangdetectDetector, LanguageDetector, NgramProfileDetector
+
+ENGLISH = "The quick brown fox jumps over the lazy dog while the children are playing in the garden. " * 5
+GERMAN = "Der schnelle braune Fuchs springt über den faulen Hund, während die Kinder im Garten spielen. " * 5
+FRENCH = "Le renard brun rapide saute par-dessus le chien paresseux pendant que les enfants jouent dans le jardin. " * 5
+
+
+@pytest.mark.parametrize("detector_class", [NgramProfileDetector, LangdetectDetector])
+def test_detection_is_deterministic(detector_class):
+    for text, language in [(ENGLISH, "en"), (GERMAN, "de"), (FRENCH, "fr")]:
+        results = [detector_class().get_probabilities(text) for _ in range(3)]
+        assert results[0] == results[1] == results[2]
+        assert results[0][0][0] == language
+
+
+@pytest.mark.parametrize("detector_class", [NgramProfileDetector, LangdetectDetector])
+def test_nothing_to_detect(detector_class):
+    assert detector_class().get_probabilities("1234 5678 !!!") == []
+    assert detector_class().detect("") is None
+
+
+def test_probabilities_are_sorted():
+    probabilities = NgramProfileDetector().get_probabilities(ENGLISH)
+    values = [probability for language, probability in probabilities]
+    assert values == sorted(values, reverse=True)
+    assert sum(values) <= 1.0
+
+
+def test_sample_windows():
+    detector = LanguageDetector(sample_windows=3, window_size=10)
+    text = "".join(chr(ord("a") + i % 26) for i in range(100))
+    assert detector.sample(text) == "\n".join([text[0:10], text[45:55], text[90:100]])
+    # Short texts are not sampled
+    assert detector.sample(text[:30]) == text[:30]
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip("readabilipy")
+
+from langsearch.pipelines.common import readability_worker
+from langsearch.pipelines.common.readability_worker import NodeReadabilityPool
+
+ARTICLE = (
+    "<html><head><title>Foxes</title></head><body><nav>Home | About</nav><article><h1>Foxes</h1>"
+    + "<p>The quick brown fox jumps over the lazy dog, and then it runs back into the forest to rest.</p>" * 20
+    + "</article><footer>Copyright</footer></body></html>"
+)
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+
+@requires_node
+def test_extracts_article():
+    pool = NodeReadabilityPool(1, 10, 30)
+    try:
+        content = pool.extract(ARTICLE)
+    finally:
+        pool.close()
+    assert "The quick brown fox" in content
+    assert "Copyright" not in content
+
+
+@requires_node
+def test_worker_is_replaced_after_max_documents():
+    pool = NodeReadabilityPool(1, 2, 30)
+    try:
+        pool.extract(ARTICLE)
+        worker = pool.get_worker()
+        pool.extract(ARTICLE)
+        assert pool.get_worker() is not worker
+    finally:
+        pool.close()
+
+
+@requires_node
+def test_timeout_starts_when_worker_starts_document(monkeypatch):
+    # Readability.js returns after sleeping for the number of milliseconds in the document
+    script = readability_worker.SCRIPT.replace(
+        "const article = new Readability(dom.window.document).parse();",
+        "Atomics.wait(new Int32Array(new SharedArrayBuffer(4)), 0, 0, Number(request.html));"
+        " const article = { content: request.html };"
+    )
+    monkeypatch.setattr(readability_worker, "SCRIPT", script)
+    pool = NodeReadabilityPool(1, 10, 1.5)
+    try:
+        start = time.monotonic()
+        with ThreadPoolExecutor(3) as executor:
+            # Each document takes less than the timeout, but all of them together take longer
+            futures = [executor.submit(pool.extract, "1000") for _ in range(3)]
+            assert [future.result() for future in futures] == ["1000"] * 3
+        assert time.monotonic() - start >= 3
+        with pytest.raises(TimeoutError):
+            pool.extract("3000")
+    finally:
+        pool.close()
@@ -0,0 +1,104 @@
+import datetime
+from types import SimpleNamespace
+
+from langsearch.pipelines.common.storeitem import BaseStoreItemPipeline
+
+NOW = datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc)
+
+
+def make_object(class_name, url, **properties):
+    return {"class": class_name, "properties": {"url": url, **properties}}
+
+
+class FakeQuery:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def get(self, class_name, properties):
+        self.class_name = class_name
+        self.properties = properties
+        return self
+
+    def with_additional(self, properties):
+        return self
+
+    def with_where(self, where_filter):
+        self.urls = {operand["valueString"] for operand in where_filter["operands"]}
+        return self
+
+    def with_limit(self, limit):
+        return self
+
+    def do(self):
+        data_objects = [
+            {key: data_object["properties"].get(key) for key in self.properties}
+            for data_object in self.objects.get(self.class_name, []) if data_object["properties"]["url"] in self.urls
+        ]
+        return {"data": {"Get": {self.class_name: data_objects}}}
+
+
+class FakeWeaviate:
+    def __init__(self, objects):
+        self.objects = objects
+        self.deleted = []
+        self.client = SimpleNamespace(query=FakeQuery(objects))
+
+    def register_classes(self, class_schemas):
+        pass
+
+    def iter_objects(self, class_name, page_size=100):
+        yield from self.objects.get(class_name, [])
+
+    def delete_by_url(self, class_name, url):
+        self.deleted.append((class_name, url))
+
+
+def make_pipeline():
+    objects = {
+        "CrawlData": [
+            make_object("CrawlData", "https://example.com/fresh", last_seen="2026-09-30T12:00:00.000000Z"),
+            make_object("CrawlData", "https://example.com/stale", last_seen="2026-08-01T12:00:00+00:00"),
+            make_object("CrawlData", "https://example.com/never"),
+        ],
+        "Section": [
+            # Sections keep the last_seen of their last change, which doesn't count
+            make_object("Section", "https://example.com/fresh", last_seen="2026-01-01T00:00:00Z"),
+            make_object("Section", "https://example.com/fresh", last_seen="2026-01-01T00:00:00Z"),
+            make_object("Section", "https://example.com/stale", last_seen="2026-09-30T00:00:00Z"),
+            make_object("Section", "https://example.com/orphan"),
+        ],
+        "Summary": [
+            make_object("Summary", "https://example.com/fresh"),
+            make_object("Summary", "https://example.com/stale"),
+        ],
+    }
+    pipeline_class = type("TestStoreItemPipeline", (BaseStoreItemPipeline,), {"weaviate": FakeWeaviate(objects)})
+    return pipeline_class()
+
+
+def test_get_last_seen():
+    pipeline = make_pipeline()
+    assert pipeline.get_last_seen(["https://example.com/fresh", "https://example.com/unknown"]) == {
+        "https://example.com/fresh": "2026-09-30T12:00:00.000000Z",
+        "https://example.com/unknown": None
+    }
+
+
+def test_get_urls_not_seen_since():
+    pipeline = make_pipeline()
+    assert list(pipeline.get_urls_not_seen_since(NOW - datetime.timedelta(days=7))) == [
+        "https://example.com/stale", "https://example.com/never"
+    ]
+
+
+def test_collect_garbage_joins_against_crawl_db():
+    pipeline = make_pipeline()
+    deleted = pipeline.collect_garbage(["Section", "Summary"], NOW - datetime.timedelta(days=7))
+    assert deleted == {"Section": 2, "Summary": 1, "CrawlData": 2}
+    assert sorted(pipeline.weaviate.deleted) == [
+        ("CrawlData", "https://example.com/never"),
+        ("CrawlData", "https://example.com/stale"),
+        ("Section", "https://example.com/orphan"),
+        ("Section", "https://example.com/stale"),
+        ("Summary", "https://example.com/stale"),
+    ]
@@ -0,0 +1,84 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# The summary module creates an OpenAI LLM when it is imported, which needs a key but no requests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+summary_index = pytest.importorskip("langsearch.pipelines.common.summary_index")
+
+from langsearch import tokens
+from langsearch.pipelines.base import ItemContext
+from langsearch.pipelines.common.mixins.weaviatedb import WeaviateDB
+
+URL = "https://example.com/page"
+
+
+class FakeWeaviate:
+    def __init__(self, existing):
+        self.existing = existing
+        self.upserts = []
+        self.client = SimpleNamespace(data_object=SimpleNamespace(exists=self.exists))
+
+    def exists(self, uuid, class_name):
+        return uuid in self.existing
+
+    @staticmethod
+    def get_uuid(class_name, *keys):
+        return WeaviateDB.get_uuid(class_name, *keys)
+
+    def register_classes(self, class_schemas):
+        pass
+
+    def upsert(self, class_name, data, batch_size=100):
+        self.upserts.extend(data)
+
+
+def make_pipeline(existing):
+    pipeline_class = type(
+        "TestSummaryIndexPipeline",
+        (summary_index.BaseSummaryIndexPipeline,),
+        {"weaviate": FakeWeaviate(existing), "summarize": lambda self, sections: " ".join(sections)}
+    )
+    return pipeline_class()
+
+
+def apply(pipeline, changed):
+    context = ItemContext(url=URL, sections=None, changed=changed, summarizer_input={"sections": ["a", "b"]})
+    return pipeline.apply({}, None, context)
+
+
+def test_unchanged_url_with_summary_is_skipped():
+    pipeline = make_pipeline({WeaviateDB.get_uuid("Summary", URL)})
+    apply(pipeline, False)
+    assert pipeline.weaviate.upserts == []
+
+
+def test_unchanged_url_without_summary_is_summarized():
+    pipeline = make_pipeline(set())
+    apply(pipeline, False)
+    [(unique_id, data_object)] = pipeline.weaviate.upserts
+    assert unique_id == WeaviateDB.get_uuid("Summary", URL)
+    assert data_object["summary"] == "a b"
+
+
+def test_changed_url_is_summarized():
+    pipeline = make_pipeline({WeaviateDB.get_uuid("Summary", URL)})
+    apply(pipeline, True)
+    assert len(pipeline.weaviate.upserts) == 1
+
+
+def test_sections_are_counted_in_one_batch(monkeypatch):
+    batches = []
+
+    class WordEncoding:
+        def encode_batch(self, texts):
+            batches.append(texts)
+            return [text.split() for text in texts]
+
+    monkeypatch.setattr(tokens, "get_encoding", lambda encoding_name: WordEncoding())
+    monkeypatch.setattr(tokens, "_counters", {})
+    pipeline = summary_index.SummaryIndexPipeline.__new__(summary_index.SummaryIndexPipeline)
+    pipeline.summary_llm_length_function = tokens.count_tokens
+    assert pipeline.get_lengths(["two words", "three more words"]) == [2, 3]
+    assert batches == [["two words", "three more words"]]
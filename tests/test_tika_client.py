@@ -0,0 +1,95 @@
+import pytest
+import requests
+from scrapy.exceptions import DropItem
+
+from langsearch.pipelines.base import ItemContext
+from langsearch.pipelines.common import tika_client
+from langsearch.pipelines.common.tika import TikaPipeline
+from langsearch.pipelines.common.tika_client import TikaClient
+
+ENDPOINT = "http://127.0.0.1:9998"
+
+
+class FakeResponse:
+    def __init__(self, json):
+        self._json = json
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._json
+
+
+class FakeSession:
+    """
+    Fails to connect `failures` times, then answers with `json`.
+    """
+    def __init__(self, failures, json=None):
+        self.failures = failures
+        self.json = json
+        self.urls = []
+
+    def put(self, url, **kwargs):
+        self.urls.append(url)
+        if len(self.urls) <= self.failures:
+            raise requests.ConnectionError(f"Could not connect to {url}")
+        return FakeResponse(self.json)
+
+
+class FakeServerPool:
+    def __init__(self, restarts):
+        self.restarts = restarts
+        self.restarted = []
+
+    def restart_exited(self, endpoint):
+        if len(self.restarted) == self.restarts:
+            return False
+        self.restarted.append(endpoint)
+        return True
+
+
+def make_client(endpoints, session, server_pool=None):
+    client = TikaClient(endpoints, server_pool=server_pool)
+    client.session = session
+    return client
+
+
+def test_restarted_server_is_retried():
+    session = FakeSession(1, [{"X-TIKA:content": "<p>text</p>"}])
+    server_pool = FakeServerPool(1)
+    client = make_client([ENDPOINT], session, server_pool)
+    assert client.parse_xml(b"body") == "<p>text</p>"
+    assert session.urls == [f"{ENDPOINT}/rmeta/xml"] * 2
+    assert server_pool.restarted == [ENDPOINT]
+
+
+def test_restarts_are_bounded():
+    session = FakeSession(10, [])
+    server_pool = FakeServerPool(10)
+    client = make_client([ENDPOINT], session, server_pool)
+    with pytest.raises(requests.ConnectionError):
+        client.parse_xml(b"body")
+    assert len(server_pool.restarted) == tika_client.MAX_RESTARTS
+    assert len(session.urls) == tika_client.MAX_RESTARTS + 1
+
+
+def test_next_endpoint_is_tried():
+    other_endpoint = "http://127.0.0.1:9999"
+    session = FakeSession(1, [{"X-TIKA:content": "<p>text</p>"}])
+    client = make_client([ENDPOINT, other_endpoint], session)
+    assert client.parse_xml(b"body") == "<p>text</p>"
+    assert session.urls == [f"{ENDPOINT}/rmeta/xml", f"{other_endpoint}/rmeta/xml"]
+
+
+def test_content_of_embedded_documents_is_joined():
+    session = FakeSession(0, [{"X-TIKA:content": "<p>container</p>"}, {}, {"X-TIKA:content": "<p>embedded</p>"}])
+    client = make_client([ENDPOINT], session)
+    assert client.parse_xml(b"body") == "<p>container</p><p>embedded</p>"
+
+
+def test_document_without_content_is_dropped():
+    session = FakeSession(0, [{"X-TIKA:content": None}])
+    pipeline = TikaPipeline(make_client([ENDPOINT], session))
+    with pytest.raises(DropItem):
+        pipeline.apply({}, None, ItemContext(body=b"body", url="https://example.com/empty.pdf"))
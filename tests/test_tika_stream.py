@@ -0,0 +1,85 @@
+from langsearch.pipelines.base import ItemContext
+from langsearch.pipelines.common.inscriptis import InscriptisPipeline
+from langsearch.pipelines.common.tika_stream import TikaStreamingPipeline
+from langsearch.utils import simhash, text_fingerprint
+
+# What Tika 2 sends for a PDF with two pages on /tika with Accept: text/xml
+XHTML = b"""<?xml version="1.0" encoding="UTF-8"?><html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<meta name="pdf:PDFVersion" content="1.4"/>
+<meta name="xmpTPg:NPages" content="2"/>
+<meta name="Content-Type" content="application/pdf"/>
+<title>Manual</title>
+</head>
+<body><div class="page"><p/>
+<p>Installing the pump. Unpack the pump and check that all parts are there.
+</p>
+<p>Mount the pump on a level surface.<br/>Tighten the four screws.
+</p>
+<p/>
+</div>
+<div class="page"><p/>
+<p>Maintenance. Clean the filter every month and replace the seals every year.
+</p>
+<p/>
+</div>
+</body></html>"""
+
+
+class FakeTikaClient:
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+
+    def iter_xhtml(self, body, chunk_size=65536):
+        for start in range(0, len(XHTML), self.chunk_size):
+            yield XHTML[start:start + self.chunk_size]
+
+
+class ParagraphSplitter:
+    """
+    Splits at blank lines and counts words, so that the tests don't need a tiktoken encoding.
+    """
+    def split_text_with_counts(self, text):
+        sections = [section.strip() for section in text.split("\n\n") if section.strip() != ""]
+        return [(section, len(section.split())) for section in sections]
+
+
+def make_pipeline(chunk_size, max_text_length=100000):
+    return TikaStreamingPipeline(
+        FakeTikaClient(chunk_size), InscriptisPipeline.PARSER_CONFIG, max_text_length, ParagraphSplitter, {}, 0
+    )
+
+
+def apply(pipeline):
+    return pipeline.apply({}, None, ItemContext(body=b"%PDF-1.4", url="https://example.com/manual.pdf"))
+
+
+def test_pages_are_split_while_streaming():
+    pages = list(make_pipeline(17).iter_pages(b"%PDF-1.4"))
+    assert len(pages) == 2
+    assert "Tighten the four screws." in pages[0]
+    assert "Maintenance." in pages[1]
+    # The result doesn't depend on where the chunks end
+    assert pages == list(make_pipeline(65536).iter_pages(b"%PDF-1.4"))
+
+
+def test_sections_and_hashes():
+    item = apply(make_pipeline(17))
+    pages = list(make_pipeline(65536).iter_pages(b"%PDF-1.4"))
+    text = "\n\n".join(pages)
+    assert " ".join(item[TikaStreamingPipeline.SECTIONS]).split() == text.split()
+    assert item[TikaStreamingPipeline.SECTION_TOKEN_COUNTS] == [
+        len(section.split()) for section in item[TikaStreamingPipeline.SECTIONS]
+    ]
+    assert item[TikaStreamingPipeline.EXTRACTED_TEXT] == text
+    assert item[TikaStreamingPipeline.TEXT_FINGERPRINT] == text_fingerprint(text)
+    assert item[TikaStreamingPipeline.TEXT_SIMHASH] == simhash(text)
+
+
+def test_extracted_text_is_capped():
+    item = apply(make_pipeline(17, max_text_length=20))
+    pages = list(make_pipeline(65536).iter_pages(b"%PDF-1.4"))
+    text = "\n\n".join(pages)
+    assert item[TikaStreamingPipeline.EXTRACTED_TEXT] == text[:20]
+    # The hashes are still those of the whole text
+    assert item[TikaStreamingPipeline.TEXT_FINGERPRINT] == text_fingerprint(text)
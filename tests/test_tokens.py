@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from langsearch import tokens
+from langsearch.tokens import MAX_KEY_LENGTH, TokenCounter
+
+
+class WordEncoding:
+    """
+    Encoding with one token per word, so that the tests don't need to download a tiktoken encoding.
+    """
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return text.split()
+
+    def encode_batch(self, texts):
+        return [self.encode(text) for text in texts]
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    encoding = WordEncoding()
+    monkeypatch.setattr(tokens, "get_encoding", lambda encoding_name: encoding)
+    return encoding
+
+
+def test_short_texts_are_their_own_key():
+    text = "a" * MAX_KEY_LENGTH
+    assert TokenCounter.get_key(text) == text
+
+
+def test_long_texts_are_keyed_by_digest():
+    text = "a" * (MAX_KEY_LENGTH + 1)
+    key = TokenCounter.get_key(text)
+    assert isinstance(key, bytes)
+    assert len(key) == 16
+    assert key == TokenCounter.get_key("a" * (MAX_KEY_LENGTH + 1))
+    assert key != TokenCounter.get_key("a" * (MAX_KEY_LENGTH + 2))
+    # Lone surrogates don't break the key
+    assert TokenCounter.get_key("\ud800" * (MAX_KEY_LENGTH + 1)) != key
+
+
+def test_short_text_and_digest_keys_dont_collide(encoding):
+    counter = TokenCounter()
+    long_text = "word " * MAX_KEY_LENGTH
+    short_text = TokenCounter.get_key(long_text).decode("latin-1")
+    assert counter.count(long_text) == MAX_KEY_LENGTH
+    assert counter.count(short_text) == len(short_text.split())
+    assert encoding.encoded == [long_text, short_text]
+
+
+def test_counts_are_cached(encoding):
+    counter = TokenCounter()
+    long_text = "word " * MAX_KEY_LENGTH
+    assert counter.count("two words") == 2
+    assert counter.count("two words") == 2
+    assert counter.count_batch(["two words", long_text, "three more words"]) == [2, MAX_KEY_LENGTH, 3]
+    assert counter.count(long_text) == MAX_KEY_LENGTH
+    assert encoding.encoded == ["two words", long_text, "three more words"]
+
+
+def test_cache_is_bounded(encoding):
+    counter = TokenCounter(cache_size=2)
+    counter.count("one")
+    counter.count("two")
+    # "one" is used again, so "two" is the least recently used count
+    counter.count("one")
+    counter.count("three")
+    assert list(counter.cache) == ["one", "three"]
+
+
+def test_configure_sets_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    monkeypatch.delenv("DATA_GYM_CACHE_DIR", raising=False)
+    tokens.configure({})
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+    tokens.configure({tokens.CACHE_DIR_SETTING: str(tmp_path)})
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == str(tmp_path)
+    assert os.environ["DATA_GYM_CACHE_DIR"] == str(tmp_path)
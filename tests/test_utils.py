@@ -0,0 +1,25 @@
+import pytest
+
+from langsearch.utils import TextDigest, simhash, text_fingerprint
+
+TEXT = "The quick brown fox\njumps over   the lazy dog. " * 10
+
+
+@pytest.mark.parametrize("text", ["", " \n ", "one", "One two", "one two three", TEXT])
+def test_digest_of_whole_text(text):
+    digest = TextDigest()
+    digest.update(text)
+    assert digest.fingerprint() == text_fingerprint(text)
+    assert digest.simhash() == simhash(text)
+
+
+@pytest.mark.parametrize("cuts", [[1], [2, 3], [5, 40, 41], [89]])
+def test_digest_of_parts(cuts):
+    words = TEXT.split()
+    parts = [" ".join(words[start:end]) for start, end in zip([0] + cuts, cuts + [len(words)])]
+    digest = TextDigest()
+    for part in parts + ["  "]:
+        digest.update(part)
+    text = "\n\n".join(parts)
+    assert digest.fingerprint() == text_fingerprint(text)
+    assert digest.simhash() == simhash(text)
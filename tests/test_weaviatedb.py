@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from langsearch.pipelines.common.mixins.weaviatedb import WeaviateDB
+
+
+class FakeResponse:
+    def __init__(self, objects):
+        self.status_code = 200
+        self.objects = objects
+
+    def json(self):
+        return {"objects": self.objects}
+
+
+class FakeConnection:
+    def __init__(self, objects):
+        self.objects = objects
+        self.requests = []
+
+    def get(self, path, params=None):
+        self.requests.append(params)
+        objects = sorted(self.objects.values(), key=lambda data_object: data_object["id"])
+        if "after" in params:
+            objects = [data_object for data_object in objects if data_object["id"] > params["after"]]
+        return FakeResponse(objects[:params["limit"]])
+
+
+class FakeDataObject:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def get_by_id(self, uuid, class_name):
+        return self.objects.get(uuid)
+
+    def delete(self, uuid, class_name):
+        del self.objects[uuid]
+
+
+class FakeWeaviateDB(WeaviateDB):
+    def __init__(self, objects):
+        self.objects = objects
+        self.client = SimpleNamespace(_connection=FakeConnection(objects), data_object=FakeDataObject(objects))
+
+    def upsert(self, class_name, data, batch_size=100):
+        for unique_id, properties in data:
+            self.objects[unique_id] = {"id": unique_id, "class": class_name, "properties": dict(properties)}
+
+
+def make_object(unique_id, url, summary):
+    return {"id": unique_id, "class": "Summary", "properties": {"url": url, "summary": summary}}
+
+
+def test_iter_objects_pages_with_cursor():
+    objects = {f"{i:08d}": make_object(f"{i:08d}", f"https://example.com/{i}", "") for i in range(25)}
+    db = FakeWeaviateDB(objects)
+    assert [data_object["id"] for data_object in db.iter_objects("Summary", page_size=10)] == sorted(objects)
+    assert [params.get("after") for params in db.client._connection.requests] == [None, "00000009", "00000019"]
+    # Unlike offset paging, nothing is sent that Weaviate limits to QUERY_MAXIMUM_RESULTS
+    assert all("offset" not in params for params in db.client._connection.requests)
+
+
+def test_migrate_to_uuids():
+    migrated_id = WeaviateDB.get_uuid("Summary", "https://example.com/migrated")
+    objects = {
+        "legacy-1": make_object("legacy-1", "https://example.com/legacy", "legacy summary"),
+        "legacy-2": make_object("legacy-2", "https://example.com/migrated", "older summary"),
+        migrated_id: make_object(migrated_id, "https://example.com/migrated", "current summary"),
+    }
+    db = FakeWeaviateDB(objects)
+    assert db.migrate_to_uuids("Summary") == 2
+    legacy_id = WeaviateDB.get_uuid("Summary", "https://example.com/legacy")
+    assert set(objects) == {legacy_id, migrated_id}
+    assert objects[legacy_id]["properties"] == {"url": "https://example.com/legacy", "summary": "legacy summary"}
+    assert objects[migrated_id]["properties"]["summary"] == "current summary"
+    # Running it again finds nothing to move
+    assert db.migrate_to_uuids("Summary") == 0
@@ -0,0 +1,32 @@
+import pickle
+import threading
+
+import pytest
+
+pytest.importorskip("whisper")
+
+import numpy as np
+
+from langsearch.pipelines.types.audio.whisper import WhisperPipeline
+
+
+def make_pipeline():
+    # Without loading a model
+    pipeline = WhisperPipeline.__new__(WhisperPipeline)
+    super(WhisperPipeline, pipeline).__init__()
+    pipeline.model = None
+    pipeline.transcription_options = {}
+    pipeline.allowed_languages = ["en"]
+    pipeline.writer = None
+    pipeline.local = threading.local()
+    return pipeline
+
+
+def test_pipeline_can_be_pickled():
+    pipeline = make_pipeline()
+    pipeline.get_window(np.ones(10, dtype=np.float32))
+    unpickled = pickle.loads(pickle.dumps(pipeline))
+    assert not hasattr(unpickled.local, "window")
+    window = unpickled.get_window(np.ones(10, dtype=np.float32))
+    assert window[:10].sum() == 10
+    assert window[10:].sum() == 0